@@ -0,0 +1,197 @@
+import threading
+import numpy as np
+import metrics
+from history import ERROR_SEP, RESULTS_DIR, list_learners, open_learner
+
+# ------------------ ATTEMPT SNAPSHOT ------------------
+# Every learner's answers, from every shard, held as NumPy columns with the
+# strings (learner, list, word, answer) dictionary-encoded as ints. The
+# kinds of mistake, graded when each answer was recorded, are a second
+# table of (answer row, kind) pairs, since one answer can have several.
+# refresh() reads only the attempts added to each shard since the last
+# refresh, so keeping the snapshot current costs one indexed query per
+# learner; every report is then a mask and a bincount over the columns.
+class Codes:
+    def __init__(self):
+        self.values = []
+        self.index = {}
+
+    def code(self, value):
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def codes(self, values):
+        return np.fromiter((self.code(v) for v in values), dtype=np.int32, count=len(values))
+
+    def __len__(self):
+        return len(self.values)
+
+class AttemptSnapshot:
+    COLUMNS = ("learner", "list", "word", "answer", "day", "correct")
+    MISTAKE_COLUMNS = ("row", "error")
+
+    def __init__(self, results_dir=RESULTS_DIR):
+        self.results_dir = results_dir
+        self.learners = Codes()
+        self.lists = Codes()
+        self.words = Codes()
+        self.answers = Codes()
+        self.errors = Codes()
+        self._stores = {}
+        self._last_id = {}
+        self._chunks = []
+        self._rows = 0
+        self._columns = {c: np.zeros(0, dtype=bool if c == "correct" else np.int32) for c in self.COLUMNS}
+        self._mistakes = {"row": np.zeros(0, dtype=np.int64), "error": np.zeros(0, dtype=np.int32)}
+        self._lock = threading.Lock()
+
+    @metrics.timer("snapshot_refresh")
+    def refresh(self):
+        added = 0
+        with self._lock:
+            for name in list_learners(self.results_dir):
+                store = self._stores.get(name)
+                if store is None:
+                    store = self._stores[name] = open_learner(name, self.results_dir)
+                rows = store.attempts(after_id=self._last_id.get(name, 0))
+                if rows:
+                    self._chunks.append(self._chunk(name, rows, self._rows))
+                    self._rows += len(rows)
+                    self._last_id[name] = rows[-1]["id"]
+                    added += len(rows)
+        return added
+
+    def _chunk(self, learner, rows, first_row):
+        mistakes = [(first_row + i, self.errors.code(e))
+                    for i, r in enumerate(rows) if r["errors"] for e in r["errors"].split(ERROR_SEP)]
+        return {
+            "learner": np.full(len(rows), self.learners.code(learner), dtype=np.int32),
+            "list": self.lists.codes([r["list"] for r in rows]),
+            "word": self.words.codes([r["word"] for r in rows]),
+            "answer": self.answers.codes([r["answer"] for r in rows]),
+            "day": np.array([r["timestamp"][:10] for r in rows], dtype="datetime64[D]").astype(np.int32),
+            "correct": np.fromiter((r["correct"] for r in rows), dtype=bool, count=len(rows)),
+        }, {
+            "row": np.array([m[0] for m in mistakes], dtype=np.int64),
+            "error": np.array([m[1] for m in mistakes], dtype=np.int32),
+        }
+
+    @property
+    def columns(self):
+        return self._fold()[0]
+
+    @property
+    def mistakes(self):
+        # One row per mistake: the answer's row in columns, and its kind
+        return self._fold()[1]
+
+    def _fold(self):
+        # New chunks are folded into the columns the first time they're needed
+        with self._lock:
+            if self._chunks:
+                chunks = [self._columns] + [c for c, _ in self._chunks]
+                self._columns = {c: np.concatenate([chunk[c] for chunk in chunks]) for c in self.COLUMNS}
+                chunks = [self._mistakes] + [m for _, m in self._chunks]
+                self._mistakes = {c: np.concatenate([chunk[c] for chunk in chunks]) for c in self.MISTAKE_COLUMNS}
+                self._chunks = []
+            return self._columns, self._mistakes
+
+    def __len__(self):
+        return len(self.columns["day"])
+
+    # ------------------ QUERIES ------------------
+    def mask(self, lists=None, learners=None, since=None, until=None):
+        # lists/learners: names to keep (None keeps all); since/until: dates
+        cols = self.columns
+        keep = np.ones(len(cols["day"]), dtype=bool)
+        for column, codes, names in (("list", self.lists, lists), ("learner", self.learners, learners)):
+            if names is not None:
+                keep &= np.isin(cols[column], [codes.index[n] for n in names if n in codes.index])
+        if since is not None:
+            keep &= cols["day"] >= np.datetime64(since, "D").astype(np.int32)
+        if until is not None:
+            keep &= cols["day"] <= np.datetime64(until, "D").astype(np.int32)
+        return keep
+
+    def _keys(self, column, keep):
+        # The column's values compacted to 0..n-1 over the kept rows, and
+        # their labels; "week" is the day's week, labelled by its Monday
+        if column == "week":
+            values = (self.columns["day"][keep] + 3) // 7
+            present, inverse = np.unique(values, return_inverse=True)
+            return inverse, [str(np.datetime64(int(w) * 7 - 3, "D")) for w in present]
+        present, inverse = np.unique(self.columns[column][keep], return_inverse=True)
+        labels = self._codes(column).values
+        return inverse, [labels[v] for v in present]
+
+    def grid(self, keep, rows, cols):
+        # Attempts and accuracy for every (rows, cols) pair as 2-D arrays,
+        # with the labels of the rows and columns
+        r, row_labels = self._keys(rows, keep)
+        c, col_labels = self._keys(cols, keep)
+        size = len(row_labels) * len(col_labels)
+        cells = r.astype(np.int64) * len(col_labels) + c
+        shape = (len(row_labels), len(col_labels))
+        attempts = np.bincount(cells, minlength=size).reshape(shape)
+        correct = np.bincount(cells, weights=self.columns["correct"][keep], minlength=size).reshape(shape)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return row_labels, col_labels, attempts, correct / attempts
+
+    def trend(self, keep):
+        # Attempts and accuracy per day, over the days that have answers
+        day, correct = self.columns["day"][keep], self.columns["correct"][keep]
+        days, inverse = np.unique(day, return_inverse=True)
+        attempts = np.bincount(inverse, minlength=len(days))
+        right = np.bincount(inverse, weights=correct, minlength=len(days))
+        return days.astype("datetime64[D]"), attempts, right / np.maximum(attempts, 1)
+
+    def confused_words(self, keep, min_attempts=3, limit=15):
+        # The words most often got wrong, with their commonest wrong answer
+        # and kind of mistake
+        cols = self.columns
+        word, correct = cols["word"][keep], cols["correct"][keep]
+        attempts = np.bincount(word, minlength=len(self.words))
+        wrong = attempts - np.bincount(word, weights=correct, minlength=len(self.words)).astype(np.int64)
+        rate = np.where(attempts >= min_attempts, wrong / np.maximum(attempts, 1), -1.0)
+        top = [w for w in np.argsort(-rate, kind="stable")[:limit] if rate[w] > 0]
+        misses = ~correct
+        answers = self._commonest(word[misses], cols["answer"][keep][misses])
+        rows, kinds = self._kept_mistakes(keep)
+        errors = self._commonest(cols["word"][rows], kinds)
+        return [{
+            "word": self.words.values[w],
+            "attempts": int(attempts[w]),
+            "wrong": int(wrong[w]),
+            "error_rate": float(rate[w]),
+            "answer": self.answers.values[answers[w]] if w in answers else "",
+            "error": self.errors.values[errors[w]] if w in errors else "",
+        } for w in top]
+
+    def error_totals(self, keep):
+        _, kinds = self._kept_mistakes(keep)
+        counts = np.bincount(kinds, minlength=len(self.errors))
+        return {self.errors.values[e]: int(n) for e, n in enumerate(counts) if n}
+
+    def _kept_mistakes(self, keep):
+        # The rows and kinds of the mistakes made in the kept answers
+        # (rows past the mask were added by a refresh since it was made)
+        mistakes = self.mistakes
+        end = np.searchsorted(mistakes["row"], len(keep))
+        rows, kinds = mistakes["row"][:end], mistakes["error"][:end]
+        return rows[keep[rows]], kinds[keep[rows]]
+
+    def _codes(self, column):
+        return {"learner": self.learners, "list": self.lists, "word": self.words, "answer": self.answers}[column]
+
+    @staticmethod
+    def _commonest(keys, values):
+        # For each key, the value it appears with most often
+        if not len(keys):
+            return {}
+        pairs, counts = np.unique(np.stack([keys, values]), axis=1, return_counts=True)
+        order = np.lexsort((-counts, pairs[0]))
+        firsts = order[np.r_[True, pairs[0][order][1:] != pairs[0][order][:-1]]]
+        return dict(zip(pairs[0][firsts].tolist(), pairs[1][firsts].tolist()))
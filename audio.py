@@ -0,0 +1,495 @@
+import io
+import os
+import functools
+import hashlib
+import shutil
+import sqlite3
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+import metrics
+from tts_backends import LANG, TLD, get_backend
+
+try:
+    import fcntl
+except ImportError:  # Windows: clips are single-flight within a process only
+    fcntl = None
+
+# Clips are kept under Streamlit's static folder so the browser can fetch
+# them from /app/static/... (see .streamlit/config.toml). The index stays
+# outside it so it isn't served.
+STATIC_DIR = "static"
+AUDIO_DIR = os.environ.get("SPELLTEST_AUDIO_DIR", os.path.join(STATIC_DIR, "audio"))
+AUDIO_INDEX = os.environ.get("SPELLTEST_AUDIO_INDEX", "audio_index.db")
+AUDIO_CACHE_MB = float(os.environ.get("SPELLTEST_AUDIO_CACHE_MB", "200"))
+
+PROMPT = "Can you spell"
+
+# Word clips are re-encoded as mono at a low bitrate. "opus" gives the
+# smallest files; "mp3" is the default because every school browser plays it.
+AUDIO_FORMAT = os.environ.get("SPELLTEST_AUDIO_FORMAT", "mp3")
+AUDIO_BITRATE = os.environ.get("SPELLTEST_AUDIO_BITRATE", "32k")
+ENCODINGS = {
+    "mp3": ("mp3", {"format": "mp3"}),
+    "opus": ("ogg", {"format": "ogg", "codec": "libopus"}),
+}
+SILENCE_DBFS = -45.0
+PROMPT_GAP_MS = 80
+SYLLABLE_LEAD_IN_MS = 500
+SYLLABLE_GAP_MS = 250
+
+# The backend comes from SPELLTEST_TTS (gtts, stub, espeak or piper)
+def default_tts():
+    return get_backend()
+
+def voice_settings(tts, lang=LANG, tld=TLD):
+    return [tts.name, lang, tld]
+
+def write_atomic(filename, data):
+    # Write to a temp file first so a reader never sees a half-written MP3
+    tmp = f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, filename)
+
+# ------------------ AUDIO STORE ------------------
+# Clips live under <root>/<xx>/<hash>.mp3 and are tracked in an SQLite index
+# (key -> file, size, last access). When the store grows past the size cap
+# the least recently used clips are deleted. The total size is kept as a
+# running count in `meta`, updated in the same transaction as each change
+# to `clips`, so checking the cap after every put is a single-row read.
+#
+# building(key) makes clip generation single-flight: of all the sessions
+# and all the server processes sharing the store, one builds a missing clip
+# while the others wait, then find it in the index. Keys are striped over a
+# fixed set of lock files per kind next to the index. A word clip takes its
+# fragments' locks while holding its own, never the other way round, so
+# keeping the kinds apart means the locks can't deadlock. building_many()
+# takes several stripes of one kind, always in ascending order.
+class AudioStore:
+    TOUCH_INTERVAL = 60  # seconds between last-access updates for the same clip
+    LOCK_STRIPES = 256
+    EVICT_BATCH = 16
+
+    def __init__(self, root=AUDIO_DIR, max_mb=AUDIO_CACHE_MB, index=None):
+        self.root = os.path.abspath(root)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        os.makedirs(self.root, exist_ok=True)
+        self.db_path = os.path.abspath(index) if index else os.path.join(self.root, "index.db")
+        self._local = threading.local()
+        self.lock_dir = self.db_path + ".locks"
+        os.makedirs(self.lock_dir, exist_ok=True)
+        self._stripes = {}
+        self._stripes_lock = threading.Lock()
+        with self._db() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS clips (
+                    key TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    file TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS clips_lru ON clips (last_access)")
+            db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            # Counted once for an index that predates the running total
+            db.execute("""
+                INSERT OR IGNORE INTO meta (key, value)
+                VALUES ('total_size', (SELECT COALESCE(SUM(size), 0) FROM clips))
+            """)
+
+    def _db(self):
+        # sqlite connections can't be shared between threads, so keep one per thread
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.db_path, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    @staticmethod
+    def key(*parts):
+        raw = "\x1f".join(str(p) for p in parts)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def path(self, key, ext="mp3"):
+        return os.path.join(self.root, key[:2], f"{key}.{ext}")
+
+    def lookup(self, key):
+        with self._db() as db:
+            row = db.execute(
+                "SELECT file, last_access FROM clips WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if not os.path.exists(row[0]):
+                self._delete(db, key)
+                return None
+            now = time.time()
+            if now - row[1] > self.TOUCH_INTERVAL:
+                db.execute("UPDATE clips SET last_access = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def _stripe(self, key):
+        return int(key[:2], 16) % self.LOCK_STRIPES
+
+    def building(self, key, kind="clip"):
+        return self._hold(kind, self._stripe(key))
+
+    @contextmanager
+    def building_many(self, keys, kind="clip"):
+        with ExitStack() as stack:
+            for stripe in sorted({self._stripe(key) for key in keys}):
+                stack.enter_context(self._hold(kind, stripe))
+            yield
+
+    @contextmanager
+    def _hold(self, kind, stripe):
+        # Threads of this process queue on a lock, other processes on flock()
+        with self._stripes_lock:
+            lock = self._stripes.setdefault((kind, stripe), threading.Lock())
+        with lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.lock_dir, f"{kind}-{stripe:02x}.lock"), "a+b") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def read(self, key):
+        filename = self.lookup(key)
+        if filename is None:
+            return None
+        try:
+            with open(filename, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, data, kind="clip", ext="mp3"):
+        filename = self.path(key, ext)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        write_atomic(filename, data)
+        with self._db() as db:
+            # Writing `meta` first takes the write lock, so the size being
+            # replaced can't change underneath
+            db.execute(
+                "UPDATE meta SET value = value + ? - COALESCE((SELECT size FROM clips WHERE key = ?), 0)"
+                " WHERE key = 'total_size'",
+                (len(data), key),
+            )
+            db.execute(
+                "INSERT OR REPLACE INTO clips (key, kind, file, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, kind, filename, len(data), time.time()),
+            )
+        self.evict()
+        return filename
+
+    @staticmethod
+    def _delete(db, key):
+        db.execute(
+            "UPDATE meta SET value = value - COALESCE((SELECT size FROM clips WHERE key = ?), 0)"
+            " WHERE key = 'total_size'",
+            (key,),
+        )
+        db.execute("DELETE FROM clips WHERE key = ?", (key,))
+
+    def total_size(self):
+        return self._db().execute("SELECT value FROM meta WHERE key = 'total_size'").fetchone()[0]
+
+    def evict(self):
+        excess = self.total_size() - self.max_bytes
+        if excess <= 0:
+            return 0
+        removed = 0
+        with self._db() as db:
+            # At the cap, a put usually pushes out a clip or two, so only the
+            # oldest few rows are read at a time
+            while excess > 0:
+                rows = db.execute(
+                    "SELECT key, file, size FROM clips ORDER BY last_access LIMIT ?", (self.EVICT_BATCH,)
+                ).fetchall()
+                if not rows:
+                    break
+                for key, filename, size in rows:
+                    if excess <= 0:
+                        break
+                    self._delete(db, key)
+                    try:
+                        os.remove(filename)
+                    except FileNotFoundError:
+                        pass
+                    excess -= size
+                    removed += 1
+        return removed
+
+# Opened on first use rather than at import, once per process
+@functools.lru_cache(maxsize=None)
+def default_store():
+    return AudioStore(index=AUDIO_INDEX)
+
+# Clip names are hashes of everything that goes into them, so a URL never
+# changes meaning and the browser can keep it cached across questions.
+def audio_url(filename, static_dir=STATIC_DIR):
+    rel = os.path.relpath(os.path.abspath(filename), os.path.abspath(static_dir))
+    if rel.startswith(os.pardir):
+        return None
+    return "app/static/" + rel.replace(os.sep, "/")
+
+# ------------------ FRAGMENT CACHE ------------------
+# Every spoken piece (the prompt, a word, a syllable) is synthesized once and
+# stored under the hash of (text, slow, lang, tld), so fragments shared by
+# many words - "Can you spell", "circumference", "trans" - are reused. Case
+# is kept: "Polish" and "polish" are spoken differently.
+def fragment_key(text, slow, tts, store, lang=LANG, tld=TLD):
+    return store.key("fragment", text.strip(), slow, *voice_settings(tts, lang, tld))
+
+def get_fragment(text, slow=False, tts=None, lang=LANG, tld=TLD, store=None):
+    store = store or default_store()
+    tts = tts or default_tts()
+    key = fragment_key(text, slow, tts, store, lang, tld)
+    data = store.read(key)
+    metrics.cache_hit("fragment", data is not None)
+    if data is None:
+        with store.building(key, "fragment"):
+            # Someone else may have made it while this session waited
+            data = store.read(key)
+            if data is not None:
+                metrics.count("single_flight_shared", "fragment")
+                return data
+            with metrics.timed("tts"):
+                data = tts.synthesize(text, slow=slow, lang=lang, tld=tld)
+            store.put(key, data, kind="fragment")
+    return data
+
+# A batch holds the locks of every fragment in it while the backend runs, so
+# it is kept small: a live get_fragment() miss waits for one short batch
+# rather than for a whole pre-warm.
+LOCKED_BATCH = 16
+
+def synthesize_fragments(fragments, tts=None, store=None, lang=LANG, tld=TLD):
+    # Synthesizes every (text, slow) fragment not already stored, handing the
+    # backend up to batch_size (at most LOCKED_BATCH) phrases per call.
+    # Returns how many were made here.
+    store = store or default_store()
+    tts = tts or default_tts()
+    missing = {}
+    for text, slow in fragments:
+        key = fragment_key(text, slow, tts, store, lang, tld)
+        if key not in missing and store.lookup(key) is None:
+            missing[key] = (text, slow)
+    todo = list(missing.items())
+    step = max(1, min(tts.batch_size, LOCKED_BATCH))
+    made = 0
+    for start in range(0, len(todo), step):
+        chunk = todo[start:start + step]
+        # Holds the chunk's fragment locks like get_fragment() does, so other
+        # sessions and processes wait for this batch instead of repeating it
+        with store.building_many([key for key, _ in chunk], "fragment"):
+            # Skip what another process or session made in the meantime
+            chunk = [item for item in chunk if store.lookup(item[0]) is None]
+            if not chunk:
+                continue
+            with metrics.timed("tts"):
+                clips = tts.synthesize_batch([phrase for _, phrase in chunk], lang, tld)
+            for (key, _), data in zip(chunk, clips):
+                store.put(key, data, kind="fragment")
+            made += len(chunk)
+    return made
+
+def word_fragments(word, syllables=None):
+    fragments = [(PROMPT, False), (f"{word}?", False)]
+    if syllables and len(syllables) > 1:
+        fragments += [(s, True) for s in syllables]
+    return fragments
+
+# ------------------ POST-PROCESSING ------------------
+# Decodes the fragments, trims their leading/trailing silence, joins them
+# with fixed pauses and encodes one mono clip. Needs ffmpeg; without it the
+# MP3 fragments are concatenated as they are.
+@functools.lru_cache(maxsize=None)
+def encoder_available():
+    return shutil.which("ffmpeg") is not None or shutil.which("avconv") is not None
+
+def clip_encoding():
+    if AUDIO_FORMAT in ENCODINGS and encoder_available():
+        return AUDIO_FORMAT, AUDIO_BITRATE
+    return "raw", ""
+
+def fragment_pauses(fragments):
+    pauses = []
+    for i, (_, slow) in enumerate(fragments):
+        if i == 0:
+            pauses.append(0)
+        elif not slow:
+            pauses.append(PROMPT_GAP_MS)
+        else:
+            pauses.append(SYLLABLE_GAP_MS if fragments[i - 1][1] else SYLLABLE_LEAD_IN_MS)
+    return pauses
+
+def trim_silence(segment):
+    from pydub.silence import detect_leading_silence
+    start = detect_leading_silence(segment, silence_threshold=SILENCE_DBFS)
+    end = len(segment) - detect_leading_silence(segment.reverse(), silence_threshold=SILENCE_DBFS)
+    return segment[start:end] if end > start else segment
+
+@metrics.timer("encode")
+def encode_clip(clips, pauses, fmt=AUDIO_FORMAT, bitrate=AUDIO_BITRATE):
+    from pydub import AudioSegment
+    joined = AudioSegment.empty()
+    for data, pause in zip(clips, pauses):
+        # Naming the codec lets pydub skip probing the input with ffprobe
+        segment = trim_silence(AudioSegment.from_file(io.BytesIO(data), format="mp3", codec="mp3"))
+        joined += AudioSegment.silent(duration=pause, frame_rate=segment.frame_rate) + segment
+    ext, export_args = ENCODINGS[fmt]
+    out = io.BytesIO()
+    joined.set_channels(1).export(out, bitrate=bitrate, **export_args)
+    return out.getvalue(), ext
+
+# ------------------ WORD AUDIO ------------------
+# The key covers everything that changes the clip, so editing a word's
+# `syll` override, the voice or the encoding produces a new clip instead of
+# a stale one.
+def word_key(word, syllables=None, tts=None, store=None):
+    store = store or default_store()
+    return store.key("word", word, "|".join(syllables or []), *voice_settings(tts or default_tts()), *clip_encoding())
+
+@metrics.timer("audio")
+def get_audio_for_word(word, syllables=None, tts=None, store=None):
+    store = store or default_store()
+    key = word_key(word, syllables, tts, store)
+    filename = store.lookup(key)
+    metrics.cache_hit("word_clip", filename is not None)
+    if filename is not None:
+        return filename
+    with store.building(key, "word"):
+        filename = store.lookup(key)
+        if filename is not None:
+            metrics.count("single_flight_shared", "word_clip")
+            return filename
+        return _build_word(key, word, syllables, tts, store)
+
+def _build_word(key, word, syllables, tts, store):
+    fragments = word_fragments(word, syllables)
+    clips = [get_fragment(text, slow, tts, store=store) for text, slow in fragments]
+    fmt, bitrate = clip_encoding()
+    if fmt != "raw":
+        try:
+            data, ext = encode_clip(clips, fragment_pauses(fragments), fmt, bitrate)
+            return store.put(key, data, kind="word", ext=ext)
+        except Exception:
+            # Fragments ffmpeg can't decode (e.g. the stub backend's) are joined raw
+            metrics.count("encode_failures")
+    # MP3 frames concatenate cleanly, so raw fragments still play back
+    return store.put(key, b"".join(clips), kind="word")
+
+# ------------------ PREFETCH ------------------
+# While a question is on screen the clips of the next few (SPELLTEST_PREFETCH,
+# default 2) are built in the background, so "Next Word" never waits on TTS.
+# Clips that already exist are returned for the browser to preload.
+PREFETCH = int(os.environ.get("SPELLTEST_PREFETCH", "2"))
+_prefetcher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="prefetch")
+_pending = set()
+_pending_lock = threading.Lock()
+
+def _prefetch_one(key, word, syllables, tts, store):
+    try:
+        get_audio_for_word(word, syllables, tts, store)
+    except Exception:
+        # The question retries it, and is shown without audio if it fails again
+        metrics.count("prefetch_failures")
+    finally:
+        with _pending_lock:
+            _pending.discard(key)
+
+def prefetch(entries, keys=None, tts=None, store=None):
+    store = store or default_store()
+    tts = tts or default_tts()
+    ready = []
+    for i, entry in enumerate(entries):
+        key = keys[i] if keys and keys[i] else word_key(entry.word, entry.syllables, tts, store)
+        filename = store.lookup(key)
+        if filename is not None:
+            ready.append(filename)
+            continue
+        with _pending_lock:
+            if key in _pending:
+                continue
+            _pending.add(key)
+        metrics.count("prefetch_builds")
+        _prefetcher.submit(_prefetch_one, key, entry.word, entry.syllables, tts, store)
+    return ready
+
+# ------------------ PRE-WARM ------------------
+# Synthesizes the words of a list on a bounded thread pool so the quiz
+# never waits on TTS for a word the pool has already reached. With a batching
+# backend all the list's fragments are synthesized first in a few calls and
+# the words are then only assembled. Only the first SPELLTEST_PREWARM words
+# (default 200) are built: a big imported list would otherwise mean tens of
+# thousands of TTS calls and churn the whole store, and prefetch covers
+# whatever the quiz reaches beyond them.
+PREWARM_LIMIT = int(os.environ.get("SPELLTEST_PREWARM", "200"))
+
+class Prewarm:
+    def __init__(self, word_list, tts=None, workers=4, retries=3, backoff=0.5, limit=PREWARM_LIMIT):
+        word_list = word_list[:limit]
+        self.tts = tts or default_tts()
+        self.retries = retries
+        self.backoff = backoff
+        self.total = len(word_list)
+        self.done = 0
+        self.failed = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prewarm")
+        if self.tts.batch_size > 1:
+            self._futures = [self._executor.submit(self._build_batched, word_list)]
+        else:
+            self._futures = [
+                self._executor.submit(self._build, details) for details in word_list
+            ]
+        self._executor.shutdown(wait=False)
+
+    def _build_batched(self, word_list):
+        fragments = [f for details in word_list for f in word_fragments(details.word, details.syllables)]
+        for attempt in range(self.retries):
+            try:
+                synthesize_fragments(fragments, self.tts)
+                break
+            except Exception:
+                # Whatever is still missing is retried per word below
+                time.sleep(self.backoff * (2 ** attempt))
+        return [self._build(details) for details in word_list]
+
+    def _build(self, details):
+        word = details.word
+        error = None
+        for attempt in range(self.retries):
+            try:
+                path = get_audio_for_word(word, details.syllables, self.tts)
+                with self._lock:
+                    self.done += 1
+                return path
+            except Exception as e:
+                error = e
+                time.sleep(self.backoff * (2 ** attempt))
+        with self._lock:
+            self.done += 1
+            self.failed.append((word, repr(error)))
+        return None
+
+    @property
+    def finished(self):
+        return self.done >= self.total
+
+    def progress(self):
+        return self.done / self.total if self.total else 1.0
+
+    def wait(self, timeout=None):
+        for future in self._futures:
+            future.result(timeout=timeout)
+        return self
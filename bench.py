@@ -0,0 +1,272 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# ------------------ HEADLESS LOAD TEST ------------------
+# Drives many simulated learners through QuizSession with the real word
+# lists, audio store and results store, but with the stub TTS backend and
+# everything written to a throwaway directory. Usage:
+#
+#   python bench.py --sessions 500 --concurrency 8 --save baseline.json
+#   python bench.py --sessions 500 --concurrency 8 --compare baseline.json
+#   python bench.py --apptest 3          # also time full Streamlit reruns
+#   python bench.py --startup 5          # also time cold starts in fresh processes
+
+class Timings:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def time(self, stage, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.add(stage, time.perf_counter() - start)
+        return result
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    def pick(p):
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": pick(50) * 1000,
+        "p95_ms": pick(95) * 1000,
+        "p99_ms": pick(99) * 1000,
+        "total_s": sum(ordered),
+    }
+
+def run_session(seed, list_name, accuracy, timings, stores, words_file):
+    from audio import get_audio_for_word
+    from tts_backends import get_backend
+    from quiz import QuizSession
+    from wordlists import load_word_lists
+
+    audio_store, histories = stores
+    history = histories[seed % len(histories)]
+    rng = random.Random(seed)
+    words = timings.time("load_words", load_word_lists, words_file)[list_name]
+    quiz = QuizSession(words, seed=seed)
+    while not quiz.done:
+        start = time.perf_counter()
+        entry = quiz.current
+        timings.time("audio", get_audio_for_word, entry.word, entry.syllables, get_backend("stub"), audio_store)
+        answer = entry.word if rng.random() < accuracy else entry.word[::-1]
+        timings.time("answer", quiz.answer, answer)
+        timings.time("record_attempt", history.record_attempt, dict(quiz.last_attempt, list=list_name))
+        timings.time("next", quiz.next)
+        timings.add("interaction", time.perf_counter() - start)
+    result = quiz.summary()
+    timings.time("save_result", history.append, {
+        "date": time.strftime("%Y-%m-%d %H:%M"), "list": list_name,
+        "score": result["score"], "fixes": result["fixes"], "misspellings": "",
+    })
+
+def run_engine(args, workdir):
+    from audio import AudioStore
+    from history import open_learner
+    from wordlists import load_word_lists
+
+    # A copy, so the compiled cache is written to the scratch directory
+    words_file = shutil.copy(os.path.join(APP_DIR, "words.yaml"), workdir)
+    lists = list(load_word_lists(words_file).keys())
+    stores = (
+        AudioStore(root=os.path.join(workdir, "audio")),
+        [open_learner(f"learner {i}", os.path.join(workdir, "results")) for i in range(args.learners)],
+    )
+    timings = Timings()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [
+            pool.submit(run_session, seed, args.list or lists[seed % len(lists)], args.accuracy, timings, stores, words_file)
+            for seed in range(args.sessions)
+        ]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - start
+    interactions = len(timings.samples["interaction"])
+    return {
+        "sessions": args.sessions,
+        "concurrency": args.concurrency,
+        "learners": args.learners,
+        "elapsed_s": elapsed,
+        "sessions_per_s": args.sessions / elapsed,
+        "interactions_per_s": interactions / elapsed,
+        "stages": {stage: percentiles(s) for stage, s in sorted(timings.samples.items())},
+    }
+
+# ------------------ STREAMLIT RERUNS ------------------
+def copy_app(workdir):
+    for name in os.listdir(APP_DIR):
+        path = os.path.join(APP_DIR, name)
+        if name.endswith((".py", ".yaml")) and not name.startswith("bench"):
+            shutil.copy(path, workdir)
+        elif name in ("lists", ".streamlit"):
+            shutil.copytree(path, os.path.join(workdir, name))
+
+def run_apptest(count, workdir):
+    from streamlit.testing.v1 import AppTest
+
+    copy_app(workdir)
+    reruns = []
+    for _ in range(count):
+        at = AppTest.from_file(os.path.join(workdir, "weeb.py"), default_timeout=60)
+        start = time.perf_counter()
+        at.run()
+        reruns.append(time.perf_counter() - start)
+        while not at.session_state["quiz"].done:
+            quiz = at.session_state["quiz"]
+            buttons = {b.label: b for b in at.button}
+            if "Next Word" in buttons:
+                action = buttons["Next Word"].click
+            else:
+                if quiz.mode == "text":
+                    at.text_input[0].set_value(quiz.current.word)
+                action = buttons["Submit"].click
+            start = time.perf_counter()
+            action().run()
+            reruns.append(time.perf_counter() - start)
+            if at.exception:
+                raise RuntimeError(at.exception[0].message)
+    return {"reruns": percentiles(reruns)}
+
+# ------------------ COLD START ------------------
+# Each run is a new Python process with Streamlit already imported, timing
+# the app's first script run (its imports, word lists, stores: the first
+# paint) and the rerun after it. The first process starts from a fresh copy
+# of the app; the later ones find what it compiled, like a restarted server.
+STARTUP_SCRIPT = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("weeb.py", default_timeout=60)
+start = time.perf_counter()
+at.run()
+first = time.perf_counter() - start
+start = time.perf_counter()
+at.run()
+print(json.dumps({"first_paint": first, "rerun": time.perf_counter() - start, "error": bool(at.exception)}))
+"""
+
+def run_startup(count, workdir):
+    copy_app(workdir)
+    samples = defaultdict(list)
+    for i in range(count):
+        proc = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=workdir,
+                              capture_output=True, text=True, check=True)
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        if result["error"]:
+            raise RuntimeError("the app raised during a cold start")
+        samples["fresh_first_paint" if i == 0 else "first_paint"].append(result["first_paint"])
+        samples["rerun"].append(result["rerun"])
+    return {stage: percentiles(s) for stage, s in samples.items()}
+
+def check_budgets(report, first_paint_ms, rerun_ms):
+    over = []
+    startup = report.get("startup", {})
+    for stage, budget in (("first_paint", first_paint_ms), ("rerun", rerun_ms)):
+        if stage in startup and startup[stage]["p50_ms"] > budget:
+            over.append(f"{stage}: p50 {startup[stage]['p50_ms']:.1f}ms > budget {budget:.0f}ms")
+    return over
+
+# ------------------ REGRESSIONS ------------------
+def compare(current, baseline, threshold):
+    # A stage regresses when its p95 grew by more than `threshold` (0.2 = 20%)
+    regressions = []
+    for stage, stats in current["engine"]["stages"].items():
+        before = baseline.get("engine", {}).get("stages", {}).get(stage)
+        if before and before["p95_ms"] > 0 and stats["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append(f"{stage}: p95 {before['p95_ms']:.3f}ms -> {stats['p95_ms']:.3f}ms")
+    before = baseline.get("engine", {}).get("interactions_per_s")
+    after = current["engine"]["interactions_per_s"]
+    if before and after < before / (1 + threshold):
+        regressions.append(f"throughput: {before:.0f} -> {after:.0f} interactions/s")
+    for stage, stats in current.get("startup", {}).items():
+        before = baseline.get("startup", {}).get(stage)
+        if before and before["p50_ms"] > 0 and stats["p50_ms"] > before["p50_ms"] * (1 + threshold):
+            regressions.append(f"startup {stage}: p50 {before['p50_ms']:.1f}ms -> {stats['p50_ms']:.1f}ms")
+    return regressions
+
+def print_report(report):
+    engine = report["engine"]
+    print(f"{engine['sessions']} sessions, {engine['learners']} learners, concurrency {engine['concurrency']}: "
+          f"{engine['sessions_per_s']:.0f} sessions/s, {engine['interactions_per_s']:.0f} interactions/s")
+    print(f"{'stage':<16}{'count':>8}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'total s':>10}")
+    for stage, s in engine["stages"].items():
+        print(f"{stage:<16}{s['count']:>8}{s['mean_ms']:>10.3f}{s['p50_ms']:>10.3f}"
+              f"{s['p95_ms']:>10.3f}{s['p99_ms']:>10.3f}{s['total_s']:>10.3f}")
+    if "apptest" in report:
+        s = report["apptest"]["reruns"]
+        print(f"streamlit reruns: {s['count']} runs, p50 {s['p50_ms']:.1f}ms, p95 {s['p95_ms']:.1f}ms")
+    for stage, s in report.get("startup", {}).items():
+        print(f"startup {stage}: {s['count']} runs, p50 {s['p50_ms']:.1f}ms, max {s['p99_ms']:.1f}ms")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the spelling quiz headlessly")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--learners", type=int, default=30, help="sessions are spread over this many learner shards")
+    parser.add_argument("--list", help="word list to use (default: cycle through all)")
+    parser.add_argument("--accuracy", type=float, default=0.7, help="chance a simulated learner is right")
+    parser.add_argument("--apptest", type=int, default=0, help="also run N sessions through Streamlit's AppTest")
+    parser.add_argument("--startup", type=int, default=0, help="also time N cold starts in fresh processes")
+    parser.add_argument("--first-paint-budget", type=float, default=1000, help="ms, p50 of the first script run")
+    parser.add_argument("--rerun-budget", type=float, default=100, help="ms, p50 of a rerun after a cold start")
+    parser.add_argument("--save", help="write the report as JSON")
+    parser.add_argument("--compare", help="baseline JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    os.environ["SPELLTEST_TTS"] = "stub"
+    workdir = tempfile.mkdtemp(prefix="spelltest-bench-")
+    cwd = os.getcwd()
+    try:
+        # Modules that keep state in the working directory must see the scratch dir
+        os.chdir(workdir)
+        sys.path.insert(0, APP_DIR)
+        report = {"engine": run_engine(args, workdir)}
+        if args.apptest:
+            appdir = os.path.join(workdir, "app")
+            os.makedirs(appdir)
+            os.chdir(appdir)
+            report["apptest"] = run_apptest(args.apptest, appdir)
+        if args.startup:
+            startdir = os.path.join(workdir, "startup")
+            os.makedirs(startdir)
+            report["startup"] = run_startup(args.startup, startdir)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(report)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+    over = check_budgets(report, args.first_paint_budget, args.rerun_budget)
+    for line in over:
+        print(f"OVER BUDGET {line}")
+    if args.compare:
+        with open(args.compare, "r") as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions or over else 0
+    return 1 if over else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+import functools
+import logging
+import os
+
+logger = logging.getLogger("spelltest.distractors")
+DICT_FILE = os.environ.get("SPELLTEST_DICT", "/usr/share/dict/words")
+VOWELS = "aeiou"
+CONSONANTS = "bcdfgklmnprstvxz"
+
+# Common mistakes at the end of a word: (correct ending, misspelt ending)
+SUFFIX_ERRORS = [
+    ("tion", "sion"), ("tion", "shun"), ("sion", "tion"), ("ssion", "sion"),
+    ("ence", "ance"), ("ance", "ence"), ("ent", "ant"), ("ant", "ent"),
+    ("ible", "able"), ("able", "ible"), ("ful", "full"), ("ly", "ley"),
+    ("ally", "aly"), ("ing", "in"), ("ed", "t"), ("es", "s"), ("es", "is"),
+    ("le", "el"), ("al", "le"), ("ous", "us"), ("ture", "cher"), ("cian", "tion"),
+]
+
+# Spellings that sound alike inside a word
+SOUND_SWAPS = [
+    ("ie", "ei"), ("ei", "ie"), ("ph", "f"), ("ck", "k"), ("c", "k"), ("k", "c"),
+    ("s", "z"), ("z", "s"), ("ch", "tch"), ("tch", "ch"), ("ai", "ay"), ("ee", "ea"),
+    ("ea", "ee"), ("ou", "ow"), ("oa", "o"), ("gh", ""), ("kn", "n"), ("wr", "r"),
+    ("mb", "m"), ("dg", "g"), ("c", "s"), ("s", "c"), ("x", "cks"),
+]
+
+# ------------------ DICTIONARY ------------------
+@functools.lru_cache(maxsize=None)
+def real_words(path=DICT_FILE):
+    # A distractor that is itself a real word ("there" for "their") would be
+    # a second correct answer, so candidates are checked against a word list.
+    if not os.path.exists(path):
+        logger.warning(
+            "no word list at %s (install wamerican or set SPELLTEST_DICT); "
+            "distractors may be real words", path,
+        )
+        return frozenset()
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        return frozenset(line.strip().lower() for line in f if line.strip())
+
+# ------------------ CANDIDATES ------------------
+def _doubling(word):
+    for i, letter in enumerate(word):
+        if letter not in CONSONANTS:
+            continue
+        if i + 1 < len(word) and word[i + 1] == letter:
+            # Undouble: "dropping" -> "droping"
+            yield word[:i] + word[i + 1:]
+        elif 0 < i < len(word) - 1 and word[i - 1] in VOWELS and word[i + 1] in VOWELS + "y":
+            # Double between vowels: "foxes" -> "foxxes"
+            yield word[:i + 1] + letter + word[i + 1:]
+
+def _suffixes(word):
+    for right, wrong in SUFFIX_ERRORS:
+        if word.endswith(right) and len(word) > len(right) + 1:
+            yield word[:-len(right)] + wrong
+
+def _sound_swaps(word):
+    for right, wrong in SOUND_SWAPS:
+        start = word.find(right, 1)
+        while start != -1:
+            yield word[:start] + wrong + word[start + len(right):]
+            start = word.find(right, start + 1)
+
+def _vowel_swaps(word):
+    for i, letter in enumerate(word[1:], 1):
+        if letter in VOWELS:
+            for other in VOWELS:
+                if other != letter:
+                    yield word[:i] + other + word[i + 1:]
+
+def _consonant_run(word):
+    longest = run = 0
+    for letter in word:
+        run = 0 if letter in VOWELS + "y" else run + 1
+        longest = max(longest, run)
+    return longest
+
+def _edit_distance_one(word):
+    # Dropped letters and swapped neighbours; the first letter is kept since
+    # children rarely get that wrong, and drops that leave an unpronounceable
+    # consonant cluster ("hndbag") are skipped.
+    longest = _consonant_run(word)
+    for i in range(1, len(word)):
+        candidate = word[:i] + word[i + 1:]
+        if _consonant_run(candidate) <= max(longest, 2):
+            yield candidate
+    for i in range(1, len(word) - 1):
+        if word[i] != word[i + 1]:
+            yield word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+GENERATORS = [_doubling, _suffixes, _sound_swaps, _vowel_swaps, _edit_distance_one]
+
+# ------------------ DISTRACTORS ------------------
+# Candidates come out most plausible rule first; within a rule, in the order
+# they appear in the word. Results are cached per word.
+def _match_case(word, candidate):
+    # The rules work in lower case; the options are shown in the word's
+    # casing so the capitals don't give the answer away
+    if len(word) > 1 and word.isupper():
+        return candidate.upper()
+    if word[0].isupper():
+        return candidate[:1].upper() + candidate[1:]
+    return candidate
+
+@functools.lru_cache(maxsize=65536)
+def generate(word, count=2):
+    lower = word.lower()
+    if " " in lower or len(lower) < 3:
+        return ()
+    dictionary = real_words()
+    seen = {lower}
+    picked = []
+    # Take from each rule in turn so the options show different kinds of mistake
+    pools = [iter(g(lower)) for g in GENERATORS]
+    while pools and len(picked) < count:
+        for pool in list(pools):
+            candidate = next(pool, None)
+            while candidate is not None and (candidate in seen or candidate in dictionary):
+                candidate = next(pool, None)
+            if candidate is None:
+                pools.remove(pool)
+                continue
+            seen.add(candidate)
+            picked.append(candidate)
+            if len(picked) == count:
+                break
+    return tuple(_match_case(word, c) for c in picked)
@@ -0,0 +1,218 @@
+import functools
+from collections import namedtuple
+from distractors import SUFFIX_ERRORS, VOWELS
+
+# ------------------ GRADING ------------------
+# An answer is aligned with the word (edit distance with swaps of
+# neighbouring letters counted as one edit) and each edit is put down to a
+# kind of mistake. Answers are compared case-insensitively.
+#
+# One edit: kind is "sub", "del" (a letter of the word left out), "ins" (a
+# letter added) or "swap"; pos is the index in the word.
+Op = namedtuple("Op", ["kind", "pos", "expected", "typed"])
+Grade = namedtuple("Grade", ["correct", "distance", "ops", "errors"])
+
+ERRORS = {
+    "missed_double": "missed a double letter",
+    "extra_double": "doubled a letter",
+    "suffix": "got the ending wrong",
+    "transposition": "swapped two letters",
+    "vowel": "used the wrong vowel",
+    "consonant": "used the wrong consonant",
+    "missing_letter": "left out a letter",
+    "extra_letter": "added a letter",
+    "other_word": "wrote a different word",
+}
+SUFFIXES = sorted({right for right, _ in SUFFIX_ERRORS}, key=len, reverse=True)
+
+def _normalize(text):
+    return text.strip().lower()
+
+def limit(word):
+    # More edits than this and the answer is another word altogether
+    return _cutoff(len(_normalize(word)))
+
+def _cutoff(length):
+    return max(2, length // 2)
+
+def align(word, answer, cutoff=None):
+    # Returns (distance, ops). With a cutoff, gives up as soon as the
+    # distance is sure to be over it and returns (cutoff + 1, ()): a row's
+    # smallest value never goes down further down the table.
+    word, answer = _normalize(word), _normalize(answer)
+    rows, cols = len(word) + 1, len(answer) + 1
+    if cutoff is not None and abs(rows - cols) > cutoff:
+        return cutoff + 1, ()
+    d = [list(range(cols))]
+    for i in range(1, rows):
+        above = d[-1]
+        row = [i] * cols
+        w = word[i - 1]
+        for j in range(1, cols):
+            best = min(above[j] + 1, row[j - 1] + 1, above[j - 1] + (w != answer[j - 1]))
+            if i > 1 and j > 1 and w == answer[j - 2] and word[i - 2] == answer[j - 1]:
+                best = min(best, d[-2][j - 2] + 1)
+            row[j] = best
+        if cutoff is not None and min(row) > cutoff:
+            return cutoff + 1, ()
+        d.append(row)
+    if cutoff is not None and d[-1][-1] > cutoff:
+        return cutoff + 1, ()
+    # Walk back from the end, preferring matches, then swaps, substitutions,
+    # left-out and added letters
+    ops = []
+    i, j = len(word), len(answer)
+    while i > 0 or j > 0:
+        if i > 0 and j > 0 and word[i - 1] == answer[j - 1] and d[i][j] == d[i - 1][j - 1]:
+            i, j = i - 1, j - 1
+        elif (i > 1 and j > 1 and word[i - 1] == answer[j - 2] and word[i - 2] == answer[j - 1]
+              and d[i][j] == d[i - 2][j - 2] + 1):
+            ops.append(Op("swap", i - 2, word[i - 2:i], answer[j - 2:j]))
+            i, j = i - 2, j - 2
+        elif i > 0 and j > 0 and d[i][j] == d[i - 1][j - 1] + 1:
+            ops.append(Op("sub", i - 1, word[i - 1], answer[j - 1]))
+            i, j = i - 1, j - 1
+        elif i > 0 and d[i][j] == d[i - 1][j] + 1:
+            ops.append(Op("del", i - 1, word[i - 1], ""))
+            i -= 1
+        else:
+            ops.append(Op("ins", i, "", answer[j - 1]))
+            j -= 1
+    ops.reverse()
+    return d[-1][-1], tuple(ops)
+
+def classify(word, op):
+    return _classify(_normalize(word), op)
+
+def _classify(word, op):
+    if op.kind == "swap":
+        return "transposition"
+    if op.kind == "del":
+        neighbours = word[op.pos - 1:op.pos] + word[op.pos + 1:op.pos + 2]
+        return "missed_double" if op.expected in neighbours else "missing_letter"
+    if op.kind == "ins":
+        neighbours = word[op.pos - 1:op.pos] + word[op.pos:op.pos + 1]
+        return "extra_double" if op.typed in neighbours else "extra_letter"
+    return "vowel" if op.expected in VOWELS and op.typed in VOWELS else "consonant"
+
+@functools.lru_cache(maxsize=65536)
+def _suffix_start(normal):
+    # Where the word's common ending starts, past the end if it has none
+    suffix = next((s for s in SUFFIXES if normal.endswith(s) and len(normal) > len(s) + 1), None)
+    return len(normal) - len(suffix) if suffix else len(normal) + 1
+
+def _judge(normal, distance, ops):
+    # The Grade for an answer `distance` edits (`ops`) away from the
+    # normalized word
+    if distance == 0:
+        return Grade(True, 0, (), ())
+    cutoff = _cutoff(len(normal))
+    if distance > cutoff:
+        # Only known to be over the cutoff, see align()
+        return Grade(False, cutoff + 1, (), ("other_word",))
+    # Mistakes inside a common ending count once, as the ending
+    start = _suffix_start(normal)
+    errors = [_classify(normal, op) for op in ops if op.pos < start]
+    if any(op.pos >= start for op in ops):
+        errors.append("suffix")
+    return Grade(False, distance, ops, tuple(errors))
+
+def _grade(word, answer):
+    return _judge(_normalize(word), *align(word, answer, limit(word)))
+
+# Cached for grading answers as they come in; regrade() works through a
+# whole history with the uncached version so it doesn't flush the cache
+grade = functools.lru_cache(maxsize=65536)(_grade)
+
+def describe(errors):
+    return ", ".join(ERRORS[e] for e in dict.fromkeys(errors))
+
+# ------------------ BATCH REGRADE ------------------
+# Regrades a whole history of answers at once. Each distinct (word, answer)
+# pair is graded once. Pairs whose lengths alone put them over the cutoff
+# are "other_word" straight away; the rest are grouped by word and answer
+# length, and each big group is aligned together: the DP table is filled one
+# cell at a time across every pair as NumPy arrays, then walked back one
+# step at a time the same way, with align()'s preferences. Groups too small
+# to be worth it are aligned one by one.
+BATCH_MIN = 32
+BATCH_MAX = 20000  # pairs per DP table, to bound memory
+
+def _codes(texts, width):
+    # Texts of the same length as a (len(texts), width) array of code points
+    import numpy as np
+    codes = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.int32)
+    return codes.reshape(len(texts), width)
+
+def _batch_align(words, answers):
+    # Every word has the same length, and every answer; returns the
+    # distance and ops of each pair, ops only for those within the cutoff
+    import numpy as np
+    n, rows, cols = len(words), len(words[0]), len(answers[0])
+    a, b = _codes(words, rows), _codes(answers, cols)
+    d = np.empty((n, rows + 1, cols + 1), dtype=np.int32)
+    d[:, :, 0] = np.arange(rows + 1)
+    d[:, 0, :] = np.arange(cols + 1)
+    for i in range(1, rows + 1):
+        for j in range(1, cols + 1):
+            best = np.minimum(d[:, i - 1, j], d[:, i, j - 1]) + 1
+            np.minimum(best, d[:, i - 1, j - 1] + (a[:, i - 1] != b[:, j - 1]), out=best)
+            if i > 1 and j > 1:
+                swap = (a[:, i - 1] == b[:, j - 2]) & (a[:, i - 2] == b[:, j - 1])
+                best = np.where(swap, np.minimum(best, d[:, i - 2, j - 2] + 1), best)
+            d[:, i, j] = best
+    distance = d[:, rows, cols]
+    ops = [[] for _ in range(n)]
+    todo = np.flatnonzero((distance > 0) & (distance <= limit(words[0])))
+    i = np.full(len(todo), rows)
+    j = np.full(len(todo), cols)
+    while len(todo):
+        i1, j1 = np.maximum(i - 1, 0), np.maximum(j - 1, 0)
+        i2, j2 = np.maximum(i - 2, 0), np.maximum(j - 2, 0)
+        here = d[todo, i, j]
+        w1, w2, t1, t2 = a[todo, i1], a[todo, i2], b[todo, j1], b[todo, j2]
+        both = (i > 0) & (j > 0)
+        match = both & (w1 == t1) & (here == d[todo, i1, j1])
+        swap = ~match & (i > 1) & (j > 1) & (w1 == t2) & (w2 == t1) & (here == d[todo, i2, j2] + 1)
+        sub = ~match & ~swap & both & (here == d[todo, i1, j1] + 1)
+        dele = ~match & ~swap & ~sub & (i > 0) & (here == d[todo, i1, j] + 1)
+        ins = ~(match | swap | sub | dele)
+        for k in np.flatnonzero(~match).tolist():
+            pair, wi, aj = int(todo[k]), int(i[k]), int(j[k])
+            word, answer = words[pair], answers[pair]
+            if swap[k]:
+                ops[pair].append(Op("swap", wi - 2, word[wi - 2:wi], answer[aj - 2:aj]))
+            elif sub[k]:
+                ops[pair].append(Op("sub", wi - 1, word[wi - 1], answer[aj - 1]))
+            elif dele[k]:
+                ops[pair].append(Op("del", wi - 1, word[wi - 1], ""))
+            else:
+                ops[pair].append(Op("ins", wi, "", answer[aj - 1]))
+        i = i - np.where(swap, 2, np.where(ins, 0, 1))
+        j = j - np.where(swap, 2, np.where(dele, 0, 1))
+        left = (i > 0) | (j > 0)
+        todo, i, j = todo[left], i[left], j[left]
+    return distance.tolist(), [tuple(reversed(o)) for o in ops]
+
+def regrade(words, answers):
+    # Returns the mistakes in every answer, in order
+    keys = [(w.strip().lower(), a.strip().lower()) for w, a in zip(words, answers)]
+    found = {}
+    groups = {}
+    for word, answer in dict.fromkeys(keys):
+        if word == answer:
+            found[word, answer] = ()
+        elif abs(len(word) - len(answer)) > _cutoff(len(word)):
+            found[word, answer] = ("other_word",)
+        else:
+            groups.setdefault((len(word), len(answer)), []).append((word, answer))
+    for pairs in groups.values():
+        if len(pairs) < BATCH_MIN:
+            for pair in pairs:
+                found[pair] = _grade(*pair).errors
+            continue
+        for start in range(0, len(pairs), BATCH_MAX):
+            chunk = pairs[start:start + BATCH_MAX]
+            for pair, distance, ops in zip(chunk, *_batch_align([w for w, _ in chunk], [a for _, a in chunk])):
+                found[pair] = _judge(pair[0], distance, ops).errors
+    return [found[key] for key in keys]
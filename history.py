@@ -0,0 +1,356 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import Counter
+from urllib.parse import quote, unquote
+from datetime import datetime, timedelta
+import metrics
+from grading import grade, regrade
+
+HISTORY_DB = "spells.db"
+LEGACY_HISTORY_FILE = "spells.json"
+
+# ------------------ LEARNERS ------------------
+# Each learner's results live in their own database file (a shard), so a
+# session only ever opens its learner's data and learners never wait on each
+# other's writes. The default learner keeps the original spells.db, which is
+# also where an old spells.json gets imported.
+RESULTS_DIR = "results"
+DEFAULT_LEARNER = "Me"
+
+def learner_path(name, results_dir=RESULTS_DIR):
+    if name == DEFAULT_LEARNER:
+        return HISTORY_DB
+    return os.path.join(results_dir, quote(name.strip(), safe="") + ".db")
+
+def list_learners(results_dir=RESULTS_DIR):
+    names = []
+    if os.path.isdir(results_dir):
+        names = sorted(unquote(f[:-3]) for f in os.listdir(results_dir) if f.endswith(".db"))
+    return [DEFAULT_LEARNER] + [n for n in names if n != DEFAULT_LEARNER]
+
+def open_learner(name, results_dir=RESULTS_DIR):
+    if name == DEFAULT_LEARNER:
+        return HistoryStore()
+    os.makedirs(results_dir, exist_ok=True)
+    return HistoryStore(path=learner_path(name, results_dir), legacy_file=None)
+
+# An attempt's kinds of mistake (see grading.py) are stored joined by this
+ERROR_SEP = ","
+
+# Leitner boxes: days until a word in that box is due again
+LEITNER_INTERVALS = [0, 1, 2, 4, 8, 16]
+
+# ------------------ RESULTS STORE ------------------
+# Completed tests are appended as rows to an SQLite database in WAL mode, so
+# saving one result never rewrites the others and several sessions (or
+# server processes) can write at the same time.
+class HistoryStore:
+    FIELDS = ["date", "list", "score", "fixes", "misspellings"]
+
+    def __init__(self, path=HISTORY_DB, legacy_file=LEGACY_HISTORY_FILE):
+        self.path = path
+        self._local = threading.local()
+        db = self._db()
+        with db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    date TEXT NOT NULL,
+                    list TEXT NOT NULL,
+                    score TEXT NOT NULL,
+                    fixes TEXT NOT NULL,
+                    misspellings TEXT NOT NULL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS runs_list ON runs (list, id)")
+            db.execute("CREATE INDEX IF NOT EXISTS runs_date ON runs (date)")
+            db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            # One row per answered question
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS attempts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp TEXT NOT NULL,
+                    list TEXT NOT NULL,
+                    word TEXT NOT NULL,
+                    mode TEXT NOT NULL,
+                    answer TEXT NOT NULL,
+                    correct INTEGER NOT NULL,
+                    round INTEGER NOT NULL,
+                    errors TEXT NOT NULL DEFAULT ''
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS attempts_word ON attempts (list, word)")
+            # Counters kept up to date on every attempt, so stats never rescan attempts
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS word_stats (
+                    list TEXT NOT NULL,
+                    word TEXT NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    correct INTEGER NOT NULL,
+                    last_seen TEXT NOT NULL,
+                    PRIMARY KEY (list, word)
+                )
+            """)
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS daily_stats (
+                    day TEXT NOT NULL,
+                    list TEXT NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    correct INTEGER NOT NULL,
+                    PRIMARY KEY (list, day)
+                )
+            """)
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS schedule (
+                    list TEXT NOT NULL,
+                    word TEXT NOT NULL,
+                    box INTEGER NOT NULL,
+                    due TEXT NOT NULL,
+                    PRIMARY KEY (list, word)
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS schedule_due ON schedule (list, due)")
+            # How often each kind of mistake (see grading.py) was made on each word
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS error_stats (
+                    list TEXT NOT NULL,
+                    word TEXT NOT NULL,
+                    error TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (list, word, error)
+                )
+            """)
+        if legacy_file:
+            self.migrate(legacy_file)
+        self._backfill_errors()
+
+    def _db(self):
+        # sqlite connections can't be shared between threads, so keep one per thread
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def migrate(self, legacy_file):
+        # Import the old spells.json once; BEGIN IMMEDIATE makes sure only one
+        # process does it even if several start together.
+        if not os.path.exists(legacy_file):
+            return 0
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            done = db.execute("SELECT value FROM meta WHERE key = 'migrated'").fetchone()
+            if done is not None:
+                db.rollback()
+                return 0
+            with open(legacy_file, "r") as f:
+                entries = json.load(f)
+            db.executemany(
+                "INSERT INTO runs (date, list, score, fixes, misspellings) VALUES (?, ?, ?, ?, ?)",
+                [[entry.get(k, "") for k in self.FIELDS] for entry in entries],
+            )
+            db.execute("INSERT INTO meta (key, value) VALUES ('migrated', ?)", (legacy_file,))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return len(entries)
+
+    def _backfill_errors(self):
+        # Grade the wrong answers recorded before mistakes were kept, once:
+        # onto their attempt rows and, if it predates them too, into error_stats
+        db = self._db()
+        if db.execute("SELECT value FROM meta WHERE key = 'attempt_errors'").fetchone() is not None:
+            return
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if "errors" not in [row["name"] for row in db.execute("PRAGMA table_info(attempts)")]:
+                db.execute("ALTER TABLE attempts ADD COLUMN errors TEXT NOT NULL DEFAULT ''")
+            if db.execute("SELECT value FROM meta WHERE key = 'attempt_errors'").fetchone() is None:
+                rows = db.execute("SELECT id, list, word, answer FROM attempts WHERE correct = 0").fetchall()
+                found = regrade([r["word"] for r in rows], [r["answer"] for r in rows]) if rows else []
+                db.executemany(
+                    "UPDATE attempts SET errors = ? WHERE id = ?",
+                    [(ERROR_SEP.join(errors), row["id"]) for row, errors in zip(rows, found)],
+                )
+                if db.execute("SELECT value FROM meta WHERE key = 'error_stats'").fetchone() is None:
+                    counts = Counter()
+                    for row, errors in zip(rows, found):
+                        counts.update((row["list"], row["word"], e) for e in errors)
+                    db.executemany(
+                        "INSERT INTO error_stats (list, word, error, count) VALUES (?, ?, ?, ?)",
+                        [(*key, n) for key, n in counts.items()],
+                    )
+                    db.execute("INSERT INTO meta (key, value) VALUES ('error_stats', ?)", (datetime.now().isoformat(),))
+                db.execute("INSERT INTO meta (key, value) VALUES ('attempt_errors', ?)", (datetime.now().isoformat(),))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    @metrics.timer("history_write")
+    def append(self, entry):
+        with self._db() as db:
+            cur = db.execute(
+                "INSERT INTO runs (date, list, score, fixes, misspellings) VALUES (?, ?, ?, ?, ?)",
+                [entry.get(k, "") for k in self.FIELDS],
+            )
+        return cur.lastrowid
+
+    # Keyset pagination: pass the returned cursor back as `before` to get the
+    # next (older) page. Dates are "YYYY-MM-DD HH:MM" strings, so `since` and
+    # `until` can be dates or full timestamps.
+    @metrics.timer("history_read")
+    def query(self, list_name=None, since=None, until=None, before=None, limit=10):
+        where, params = [], []
+        if list_name:
+            where.append("list = ?")
+            params.append(list_name)
+        if since:
+            where.append("date >= ?")
+            params.append(str(since))
+        if until:
+            # Include the whole of the last day when only a date is given
+            where.append("date < ?")
+            params.append(str(until) + "\uffff")
+        if before is not None:
+            where.append("id < ?")
+            params.append(before)
+        sql = "SELECT * FROM runs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id DESC LIMIT ?"
+        rows = [dict(row) for row in self._db().execute(sql, params + [limit + 1]).fetchall()]
+        cursor = rows[limit - 1]["id"] if len(rows) > limit else None
+        return rows[:limit], cursor
+
+    # ------------------ ATTEMPTS & MASTERY ------------------
+    ATTEMPT_FIELDS = ["timestamp", "list", "word", "mode", "answer", "correct", "round", "errors"]
+
+    @metrics.timer("history_write")
+    def record_attempt(self, attempt):
+        attempt = dict(attempt)
+        attempt.setdefault("timestamp", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        attempt["correct"] = int(bool(attempt["correct"]))
+        errors = () if attempt["correct"] else grade(attempt["word"], attempt["answer"]).errors
+        attempt["errors"] = ERROR_SEP.join(errors)
+        day = attempt["timestamp"][:10]
+        with self._db() as db:
+            db.execute(
+                "INSERT INTO attempts (timestamp, list, word, mode, answer, correct, round, errors) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [attempt[k] for k in self.ATTEMPT_FIELDS],
+            )
+            db.execute("""
+                INSERT INTO word_stats (list, word, attempts, correct, last_seen) VALUES (?, ?, 1, ?, ?)
+                ON CONFLICT (list, word) DO UPDATE SET
+                    attempts = attempts + 1,
+                    correct = correct + excluded.correct,
+                    last_seen = excluded.last_seen
+            """, (attempt["list"], attempt["word"], attempt["correct"], attempt["timestamp"]))
+            db.execute("""
+                INSERT INTO daily_stats (day, list, attempts, correct) VALUES (?, ?, 1, ?)
+                ON CONFLICT (list, day) DO UPDATE SET
+                    attempts = attempts + 1,
+                    correct = correct + excluded.correct
+            """, (day, attempt["list"], attempt["correct"]))
+            # Only first-round answers move a word between boxes; round 2 is
+            # the immediate correction of words just missed.
+            if attempt["round"] == 1:
+                self._reschedule(db, attempt)
+            if errors:
+                db.executemany("""
+                    INSERT INTO error_stats (list, word, error, count) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (list, word, error) DO UPDATE SET count = count + excluded.count
+                """, [(attempt["list"], attempt["word"], e, n) for e, n in Counter(errors).items()])
+
+    @metrics.timer("history_read")
+    def word_stats(self, list_name=None):
+        sql = "SELECT list, word, attempts, correct, CAST(correct AS REAL) / attempts AS accuracy, last_seen FROM word_stats"
+        params = []
+        if list_name:
+            sql += " WHERE list = ?"
+            params.append(list_name)
+        sql += " ORDER BY accuracy, attempts DESC"
+        return [dict(row) for row in self._db().execute(sql, params)]
+
+    @metrics.timer("history_read")
+    def error_stats(self, list_name=None):
+        # Kinds of mistake, most frequent first, with the words they were made on
+        sql = "SELECT error, word, count FROM error_stats"
+        params = []
+        if list_name:
+            sql += " WHERE list = ?"
+            params.append(list_name)
+        totals = {}
+        for row in self._db().execute(sql + " ORDER BY count DESC, word", params):
+            total = totals.setdefault(row["error"], {"error": row["error"], "count": 0, "words": []})
+            total["count"] += row["count"]
+            total["words"].append(row["word"])
+        return sorted(totals.values(), key=lambda t: -t["count"])
+
+    @metrics.timer("history_read")
+    def attempts(self, list_name=None, after_id=0, wrong_only=False):
+        # Answers in the order they were given; after_id lets a caller read
+        # only what was added since it last looked
+        sql = "SELECT id, timestamp, list, word, mode, answer, correct, round, errors FROM attempts WHERE id > ?"
+        params = [after_id]
+        if list_name:
+            sql += " AND list = ?"
+            params.append(list_name)
+        if wrong_only:
+            sql += " AND correct = 0"
+        sql += " ORDER BY id"
+        return self._db().execute(sql, params).fetchall()
+
+    @metrics.timer("history_read")
+    def daily_stats(self, list_name=None):
+        sql = "SELECT day, SUM(attempts) AS attempts, SUM(correct) AS correct, CAST(SUM(correct) AS REAL) / SUM(attempts) AS accuracy FROM daily_stats"
+        params = []
+        if list_name:
+            sql += " WHERE list = ?"
+            params.append(list_name)
+        sql += " GROUP BY day ORDER BY day"
+        return [dict(row) for row in self._db().execute(sql, params)]
+
+    # ------------------ SPACED REPETITION ------------------
+    def _reschedule(self, db, attempt):
+        row = db.execute(
+            "SELECT box FROM schedule WHERE list = ? AND word = ?", (attempt["list"], attempt["word"])
+        ).fetchone()
+        box = row["box"] if row else 0
+        box = min(box + 1, len(LEITNER_INTERVALS) - 1) if attempt["correct"] else 0
+        seen = datetime.strptime(attempt["timestamp"][:10], "%Y-%m-%d")
+        due = (seen + timedelta(days=LEITNER_INTERVALS[box])).strftime("%Y-%m-%d")
+        db.execute(
+            "INSERT OR REPLACE INTO schedule (list, word, box, due) VALUES (?, ?, ?, ?)",
+            (attempt["list"], attempt["word"], box, due),
+        )
+
+    def ensure_scheduled(self, list_name, words):
+        # New words start in box 0, due straight away
+        today = datetime.now().strftime("%Y-%m-%d")
+        with self._db() as db:
+            db.executemany(
+                "INSERT OR IGNORE INTO schedule (list, word, box, due) VALUES (?, ?, 0, ?)",
+                [(list_name, word, today) for word in words],
+            )
+
+    @metrics.timer("history_read")
+    def due_words(self, list_name, limit=None, today=None):
+        # Walks the (list, due) index from the oldest due date, so the cost
+        # depends on how many words are due, not on the size of the list.
+        today = today or datetime.now().strftime("%Y-%m-%d")
+        rows = self._db().execute(
+            "SELECT word FROM schedule WHERE list = ? AND due <= ? ORDER BY due, box LIMIT ?",
+            (list_name, today, -1 if limit is None else limit),
+        )
+        return [row["word"] for row in rows]
+
+    def count(self):
+        return self._db().execute("SELECT COUNT(*) FROM runs").fetchone()[0]
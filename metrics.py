@@ -0,0 +1,156 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("spelltest.metrics")
+
+# ------------------ REGISTRY ------------------
+# Process-wide timers (calls, total and max seconds per stage) and counters
+# (e.g. audio cache hits/misses). Each Streamlit rerun also collects its own
+# per-stage breakdown in a thread-local, since every session runs the script
+# on its own thread.
+_lock = threading.Lock()
+_timers = {}
+_counters = {}
+_local = threading.local()
+
+def observe(stage, seconds):
+    with _lock:
+        timer = _timers.setdefault(stage, [0, 0.0, 0.0])
+        timer[0] += 1
+        timer[1] += seconds
+        timer[2] = max(timer[2], seconds)
+    rerun = getattr(_local, "rerun", None)
+    if rerun is not None:
+        rerun[stage] = rerun.get(stage, 0.0) + seconds
+
+@contextmanager
+def timed(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+def timer(stage):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def count(name, label="", value=1):
+    with _lock:
+        _counters[(name, label)] = _counters.get((name, label), 0) + value
+
+def cache_hit(cache, hit):
+    count("cache_hits" if hit else "cache_misses", cache)
+
+def hit_rate(cache):
+    with _lock:
+        hits = _counters.get(("cache_hits", cache), 0)
+        misses = _counters.get(("cache_misses", cache), 0)
+    return hits / (hits + misses) if hits + misses else None
+
+def snapshot():
+    with _lock:
+        timers = {stage: {"calls": t[0], "total_s": t[1], "max_s": t[2]} for stage, t in _timers.items()}
+        counters = dict(_counters)
+    return timers, counters
+
+def reset():
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+# ------------------ PER RERUN ------------------
+def begin_rerun():
+    # A rerun still open here ended in an exception; its time is unknown
+    if getattr(_local, "rerun", None) is not None:
+        count("reruns_unfinished")
+    _local.rerun = {}
+    _local.rerun_start = time.perf_counter()
+
+def end_rerun():
+    stages = getattr(_local, "rerun", None)
+    if stages is None:
+        return 0.0, {}
+    total = time.perf_counter() - _local.rerun_start
+    _local.rerun = None
+    observe("rerun", total)
+    if os.environ.get("SPELLTEST_METRICS_LOG"):
+        logger.info(json.dumps({
+            "event": "rerun",
+            "total_ms": round(total * 1000, 3),
+            "stages_ms": {stage: round(s * 1000, 3) for stage, s in stages.items()},
+        }))
+    return total, stages
+
+# ------------------ EXPORT ------------------
+def prometheus_text():
+    timers, counters = snapshot()
+    lines = [
+        "# HELP spelltest_stage_seconds_total Time spent per stage.",
+        "# TYPE spelltest_stage_seconds_total counter",
+    ]
+    lines += [f'spelltest_stage_seconds_total{{stage="{s}"}} {t["total_s"]:.6f}' for s, t in sorted(timers.items())]
+    lines += [
+        "# HELP spelltest_stage_calls_total Number of times each stage ran.",
+        "# TYPE spelltest_stage_calls_total counter",
+    ]
+    lines += [f'spelltest_stage_calls_total{{stage="{s}"}} {t["calls"]}' for s, t in sorted(timers.items())]
+    lines += [
+        "# HELP spelltest_stage_seconds_max Slowest single run of each stage.",
+        "# TYPE spelltest_stage_seconds_max gauge",
+    ]
+    lines += [f'spelltest_stage_seconds_max{{stage="{s}"}} {t["max_s"]:.6f}' for s, t in sorted(timers.items())]
+    for name in sorted({name for name, _ in counters}):
+        lines.append(f"# TYPE spelltest_{name}_total counter")
+        for (n, label), value in sorted(counters.items()):
+            if n == name:
+                lines.append(f'spelltest_{name}_total{{cache="{label}"}} {value}' if label else f"spelltest_{name}_total {value}")
+    return "\n".join(lines) + "\n"
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+_server = None
+
+def serve(port, host="0.0.0.0"):
+    # Streamlit can't add routes, so /metrics is served from a small side
+    # server on its own port, started at most once per process.
+    global _server
+    with _lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                # e.g. another server process on this host already has the
+                # port; the app runs on without its own endpoint
+                logger.warning("metrics endpoint not started on port %s: %s", port, e)
+                return None
+            threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+    return _server
+
+def serve_from_env():
+    port = os.environ.get("SPELLTEST_METRICS_PORT")
+    return serve(int(port)) if port else None
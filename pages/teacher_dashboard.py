@@ -0,0 +1,99 @@
+import streamlit as st
+import altair as alt
+import numpy as np
+import pandas as pd
+from analytics import AttemptSnapshot
+from grading import ERRORS
+
+st.set_page_config(
+    page_title="Teacher dashboard",
+    page_icon="📈",
+    layout="wide"
+)
+
+# ------------------ SNAPSHOT ------------------
+# One snapshot per process, topped up with new answers on every rerun;
+# changing a filter only re-runs NumPy over the columns already in memory.
+@st.cache_resource(show_spinner=False)
+def get_snapshot():
+    return AttemptSnapshot()
+
+snapshot = get_snapshot()
+with st.spinner("Loading answers..."):
+    snapshot.refresh()
+
+st.title("📈 Teacher dashboard")
+if len(snapshot) == 0:
+    st.info("No answers recorded yet.")
+    st.stop()
+
+# ------------------ FILTERS ------------------
+col1, col2, col3 = st.columns(3)
+lists = col1.multiselect("Lists", sorted(snapshot.lists.values), placeholder="All lists")
+learners = col2.multiselect("Learners", sorted(snapshot.learners.values), placeholder="All learners")
+dates = col3.date_input("Dates", value=())
+keep = snapshot.mask(
+    lists or None,
+    learners or None,
+    since=dates[0] if len(dates) > 0 else None,
+    until=dates[1] if len(dates) > 1 else None,
+)
+total = int(keep.sum())
+if total == 0:
+    st.info("No answers match these filters.")
+    st.stop()
+
+days, attempts, accuracy = snapshot.trend(keep)
+col1, col2, col3 = st.columns(3)
+col1.metric("Answers", f"{total:,}")
+col2.metric("Accuracy", f"{snapshot.columns['correct'][keep].mean():.0%}")
+col3.metric("Learners", len(np.unique(snapshot.columns["learner"][keep])))
+
+# ------------------ HEATMAPS ------------------
+def heatmap(grid, row_title, col_title):
+    row_labels, col_labels, counts, rates = grid
+    r, c = np.nonzero(counts)
+    data = pd.DataFrame({
+        row_title: [row_labels[i] for i in r],
+        col_title: [col_labels[j] for j in c],
+        "Accuracy": rates[r, c],
+        "Answers": counts[r, c],
+    })
+    # Hardest rows at the top
+    totals = counts.sum(axis=1)
+    overall = np.divide((np.nan_to_num(rates) * counts).sum(axis=1), totals, where=totals > 0, out=np.zeros(len(totals)))
+    order = [row_labels[i] for i in np.argsort(overall, kind="stable")]
+    chart = alt.Chart(data).mark_rect().encode(
+        x=alt.X(f"{col_title}:O"),
+        y=alt.Y(f"{row_title}:N", sort=order),
+        color=alt.Color("Accuracy:Q", scale=alt.Scale(scheme="redyellowgreen", domain=[0, 1])),
+        tooltip=[row_title, col_title, alt.Tooltip("Accuracy:Q", format=".0%"), "Answers"],
+    )
+    st.altair_chart(chart)
+
+st.subheader("Lists by week")
+heatmap(snapshot.grid(keep, "list", "week"), "List", "Week")
+
+st.subheader("Words by learner")
+word_list = st.selectbox("List", sorted(set(lists) if lists else snapshot.lists.values))
+heatmap(snapshot.grid(keep & snapshot.mask([word_list]), "word", "learner"), "Word", "Learner")
+
+# ------------------ TRENDS ------------------
+st.subheader("Accuracy over time")
+st.line_chart(pd.DataFrame({"Accuracy": accuracy}, index=pd.DatetimeIndex(days.astype("datetime64[ns]"))))
+
+# ------------------ CONFUSED WORDS ------------------
+col1, col2 = st.columns([2, 1])
+with col1:
+    st.subheader("Most confused words")
+    st.dataframe(
+        [{"Word": w["word"], "Answers": w["attempts"], "Wrong": f"{w['error_rate']:.0%}",
+          "Commonest wrong answer": w["answer"], "Usual mistake": ERRORS.get(w["error"], "")}
+         for w in snapshot.confused_words(keep)],
+        hide_index=True,
+    )
+with col2:
+    st.subheader("Kinds of mistake")
+    totals = snapshot.error_totals(keep)
+    if totals:
+        st.bar_chart(pd.Series({ERRORS[e].capitalize(): n for e, n in totals.items()}, name="Answers"), horizontal=True)
@@ -0,0 +1,216 @@
+import random
+from collections import namedtuple
+
+# ------------------ QUIZ ENGINE ------------------
+# The whole test as a small state machine, independent of Streamlit:
+#
+#   asking --answer()--> answered --next()--> asking (next word)
+#                                         \--> start_round_2() when round 1 had mistakes
+#                                         \--> finish()
+#
+# Round 1 goes through every word; the words missed in round 1 are asked
+# again in round 2 ("fixes"). Asking and answering are O(1); starting a
+# round plans it once (see below).
+#
+# Each question is asked in one of the enabled modes: "text" (type the
+# word), "mc" (pick it from misspellings) or "missing" (fill in blanked-out
+# letters). A mode is only used when the word supports it.
+#
+# All the randomness is spent up front: when a round starts, the word order,
+# each question's mode, shuffled options and blanks are drawn from the
+# session's seed into a plan, and asking a question is a lookup. The same
+# words, settings and seed (and the same answers, for round 2) replay the
+# same test exactly.
+MODES = ("text", "mc", "missing")
+DEFAULT_MODES = ("text", "mc")
+DEFAULT_BLANKS = 2
+
+# `audio` is whatever the session's audio_key returns for the word (the
+# app uses the audio store key), so clips can be fetched ahead in order
+Question = namedtuple("Question", ["entry", "mode", "options", "blanks", "audio"])
+
+class QuizError(RuntimeError):
+    pass
+
+class QuizSession:
+    __slots__ = (
+        "words", "original_words", "index", "round", "score", "round_one_score",
+        "redo_words", "misspelt", "state", "mode", "options", "correct",
+        "last_attempt", "rng", "modes", "blank_count", "blanks",
+        "seed", "plan", "audio_key",
+    )
+
+    ASKING = "asking"
+    ANSWERED = "answered"
+    DONE = "done"
+
+    def __init__(self, words, seed=None, modes=DEFAULT_MODES, blanks=DEFAULT_BLANKS, shuffle=False,
+                 audio_key=None):
+        unknown = set(modes) - set(MODES)
+        if unknown or not modes:
+            raise QuizError(f"modes must be some of {', '.join(MODES)}")
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.modes = tuple(modes)
+        self.blank_count = max(1, int(blanks))
+        self.audio_key = audio_key
+        self.blanks = ()
+        self.words = list(words)
+        if shuffle:
+            self.rng.shuffle(self.words)
+        self.original_words = self.words
+        self.index = 0
+        self.round = 1
+        self.score = 0
+        self.round_one_score = 0
+        self.redo_words = []
+        self.misspelt = []
+        self.correct = None
+        self.last_attempt = None
+        self.mode = None
+        self.options = None
+        self.plan = self._plan(self.words)
+        if self.words:
+            self._ask()
+        else:
+            self.state = self.DONE
+
+    # ------------------ QUESTIONS ------------------
+    @property
+    def current(self):
+        return self.words[self.index]
+
+    @property
+    def done(self):
+        return self.state == self.DONE
+
+    @property
+    def in_round_2(self):
+        return self.round == 2
+
+    @property
+    def question_number(self):
+        return self.index + 1
+
+    @property
+    def total(self):
+        return len(self.words)
+
+    @property
+    def pattern(self):
+        # The word as shown in missing-letter mode, e.g. "f_x_s"
+        letters = list(self.current.word)
+        for i in self.blanks:
+            letters[i] = "_"
+        return "".join(letters)
+
+    @property
+    def question(self):
+        return self.plan[self.index]
+
+    def upcoming(self, count):
+        # The questions after the current one in this round, in order
+        return self.plan[self.index + 1:self.index + 1 + count]
+
+    # ------------------ PLANNING ------------------
+    def _plan_question(self, entry):
+        positions = [i for i, letter in enumerate(entry.word) if letter.isalpha()]
+        modes = [
+            m for m in self.modes
+            if m == "text" or (m == "mc" and entry.distractors) or (m == "missing" and len(positions) > 1)
+        ] or ["text"]
+        mode = self.rng.choice(modes) if len(modes) > 1 else modes[0]
+        options = None
+        blanks = ()
+        if mode == "mc":
+            options = [entry.word] + list(entry.distractors)
+            self.rng.shuffle(options)
+            options = tuple(options)
+        elif mode == "missing":
+            # At least one letter always stays visible
+            count = min(self.blank_count, len(positions) - 1)
+            blanks = tuple(sorted(self.rng.sample(positions, count)))
+        audio = self.audio_key(entry) if self.audio_key else None
+        return Question(entry, mode, options, blanks, audio)
+
+    def _plan(self, words):
+        return tuple(self._plan_question(entry) for entry in words)
+
+    def _ask(self):
+        question = self.plan[self.index]
+        self.mode = question.mode
+        self.options = question.options
+        self.blanks = question.blanks
+        self.correct = None
+        self.state = self.ASKING
+
+    # ------------------ TRANSITIONS ------------------
+    def answer(self, answer):
+        if self.state != self.ASKING:
+            raise QuizError(f"can't answer while {self.state}")
+        entry = self.current
+        self.correct = answer.strip().upper() == entry.word.upper()
+        if self.correct:
+            self.score += 1
+        else:
+            if self.round == 1:
+                self.misspelt.append((entry.word, self.mode, answer))
+            self.redo_words.append(entry)
+        self.last_attempt = {
+            "word": entry.word,
+            "mode": self.mode,
+            "answer": answer,
+            "correct": self.correct,
+            "round": self.round,
+        }
+        self.state = self.ANSWERED
+        return self.correct
+
+    def fill(self, letters):
+        # The learner's word for missing-letter mode: the typed letters go
+        # into the blanks in order
+        letters = "".join(letters.split())
+        if len(letters) != len(self.blanks):
+            raise QuizError(f"expected {len(self.blanks)} letter(s), got {len(letters)}")
+        word = list(self.current.word)
+        for i, letter in zip(self.blanks, letters):
+            word[i] = letter
+        return "".join(word)
+
+    def next(self):
+        if self.state != self.ANSWERED:
+            raise QuizError(f"can't move on while {self.state}")
+        self.index += 1
+        if self.index < len(self.words):
+            self._ask()
+        elif self.round == 1 and self.redo_words:
+            self.start_round_2()
+        else:
+            self.finish()
+        return self.state
+
+    def start_round_2(self):
+        if self.round != 1 or not self.redo_words:
+            raise QuizError("round 2 needs round 1 mistakes")
+        self.round_one_score = self.score
+        self.words = self.redo_words
+        self.plan = self._plan(self.words)
+        self.redo_words = []
+        self.round = 2
+        self.score = 0
+        self.index = 0
+        self._ask()
+
+    def finish(self):
+        if self.round == 1:
+            self.round_one_score = self.score
+        self.state = self.DONE
+
+    # ------------------ RESULTS ------------------
+    def summary(self):
+        total = len(self.original_words)
+        if self.round == 2:
+            return {"score": f"{self.round_one_score} / {total}", "fixes": f"{self.score} / {len(self.words)}"}
+        return {"score": f"{self.score} / {total}", "fixes": "0 / 0"}
@@ -0,0 +1,16 @@
+import os
+import sys
+import pytest
+
+# The app's modules live at the top of the repo; tests never call a real
+# TTS service
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["SPELLTEST_TTS"] = "stub"
+
+from wordlists import parse_entry
+
+@pytest.fixture
+def entries():
+    def make(*raws):
+        return [parse_entry(raw, f"entry {i + 1}") for i, raw in enumerate(raws)]
+    return make
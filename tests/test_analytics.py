@@ -0,0 +1,92 @@
+import datetime
+import numpy as np
+import pytest
+from analytics import AttemptSnapshot
+from history import open_learner
+
+@pytest.fixture
+def results(tmp_path, monkeypatch):
+    # The default learner's shard is spells.db in the working directory
+    monkeypatch.chdir(tmp_path)
+    return str(tmp_path / "results")
+
+def answer(store, word, typed, day, list_name="hugo"):
+    store.record_attempt({"timestamp": f"{day} 10:00:00", "list": list_name, "word": word, "mode": "text",
+                          "answer": typed, "correct": typed == word, "round": 1})
+
+def test_refresh_reads_only_new_answers(results):
+    bob = open_learner("Bob", results)
+    answer(bob, "friend", "friend", "2026-01-05")
+    snapshot = AttemptSnapshot(results)
+    assert snapshot.refresh() == 1
+    assert snapshot.refresh() == 0
+    answer(bob, "friend", "frend", "2026-01-06")
+    answer(open_learner("Ann", results), "friend", "freind", "2026-01-06")
+    assert snapshot.refresh() == 2
+    assert len(snapshot) == 3
+    assert sorted(snapshot.learners.values) == ["Ann", "Bob"]
+
+def test_every_mistake_in_an_answer_is_counted(results):
+    bob = open_learner("Bob", results)
+    answer(bob, "dropping", "dropin", "2026-01-05")
+    answer(bob, "beautiful", "beutifull", "2026-01-05")
+    answer(bob, "friend", "frend", "2026-01-05")
+    answer(bob, "friend", "friend", "2026-01-05")
+    snapshot = AttemptSnapshot(results)
+    snapshot.refresh()
+    totals = snapshot.error_totals(snapshot.mask())
+    assert totals == {"missed_double": 1, "suffix": 2, "missing_letter": 2}
+    # The same counts as the learner's own mastery table
+    assert totals == {s["error"]: s["count"] for s in bob.error_stats()}
+
+def test_masks_filter_by_list_learner_and_date(results):
+    bob, ann = open_learner("Bob", results), open_learner("Ann", results)
+    answer(bob, "foxes", "foxes", "2026-01-05")
+    answer(bob, "circle", "sircle", "2026-01-12", "cait")
+    answer(ann, "foxes", "foxs", "2026-01-20")
+    snapshot = AttemptSnapshot(results)
+    snapshot.refresh()
+    assert snapshot.mask(lists=["hugo"]).sum() == 2
+    assert snapshot.mask(learners=["Ann"]).sum() == 1
+    assert snapshot.mask(learners=["Nobody"]).sum() == 0
+    assert snapshot.mask(since=datetime.date(2026, 1, 6), until=datetime.date(2026, 1, 12)).sum() == 1
+    assert snapshot.error_totals(snapshot.mask(lists=["cait"])) == {"consonant": 1}
+
+def test_grid_and_trend(results):
+    bob = open_learner("Bob", results)
+    # 2026-01-05 and 2026-01-11 share a week; 2026-01-12 starts the next
+    answer(bob, "foxes", "foxes", "2026-01-05")
+    answer(bob, "foxes", "foxs", "2026-01-11")
+    answer(bob, "circle", "circle", "2026-01-12", "cait")
+    snapshot = AttemptSnapshot(results)
+    snapshot.refresh()
+    keep = snapshot.mask()
+    rows, cols, counts, rates = snapshot.grid(keep, "list", "week")
+    assert cols == ["2026-01-05", "2026-01-12"]
+    hugo, cait = rows.index("hugo"), rows.index("cait")
+    assert counts[hugo].tolist() == [2, 0] and counts[cait].tolist() == [0, 1]
+    assert rates[hugo, 0] == 0.5 and np.isnan(rates[hugo, 1])
+    days, attempts, accuracy = snapshot.trend(keep)
+    assert [str(d) for d in days] == ["2026-01-05", "2026-01-11", "2026-01-12"]
+    assert attempts.tolist() == [1, 1, 1] and accuracy.tolist() == [1.0, 0.0, 1.0]
+
+def test_confused_words_report_the_commonest_answer_and_mistake(results):
+    bob = open_learner("Bob", results)
+    for typed in ["frend", "frend", "freind", "friend"]:
+        answer(bob, "friend", typed, "2026-01-05")
+    for typed in ["foxes", "foxes", "foxs"]:
+        answer(bob, "foxes", typed, "2026-01-05")
+    answer(bob, "circle", "sircle", "2026-01-05")
+    snapshot = AttemptSnapshot(results)
+    snapshot.refresh()
+    words = snapshot.confused_words(snapshot.mask())
+    # circle has too few answers to rank
+    assert [w["word"] for w in words] == ["friend", "foxes"]
+    assert words[0] == {"word": "friend", "attempts": 4, "wrong": 3, "error_rate": 0.75,
+                        "answer": "frend", "error": "missing_letter"}
+
+def test_commonest_picks_the_most_frequent_value_per_key():
+    keys = np.array([0, 0, 0, 1, 2, 2])
+    values = np.array([5, 7, 7, 3, 9, 8])
+    assert AttemptSnapshot._commonest(keys, values) == {0: 7, 1: 3, 2: 8}
+    assert AttemptSnapshot._commonest(keys[:0], values[:0]) == {}
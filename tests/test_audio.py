@@ -0,0 +1,133 @@
+import threading
+import time
+import pytest
+import audio
+import metrics
+from audio import (LOCKED_BATCH, AudioStore, Prewarm, get_audio_for_word, get_fragment, prefetch,
+                   synthesize_fragments, word_fragments, word_key)
+from tts_backends import LANG, TLD, StubBackend
+
+class CountingBackend(StubBackend):
+    def __init__(self):
+        self.phrases = []
+        self.batches = []
+
+    def synthesize_batch(self, phrases, lang=LANG, tld=TLD):
+        self.batches.append(phrases)
+        return super().synthesize_batch(phrases, lang, tld)
+
+    def synthesize(self, text, slow=False, lang=LANG, tld=TLD):
+        self.phrases.append(text)
+        return super().synthesize(text, slow, lang, tld)
+
+@pytest.fixture
+def store(tmp_path):
+    return AudioStore(root=str(tmp_path / "audio"), index=str(tmp_path / "index.db"))
+
+def test_word_clips_are_built_once(store):
+    tts = CountingBackend()
+    first = get_audio_for_word("circle", ("cir", "cle"), tts, store)
+    made = len(tts.phrases)
+    assert get_audio_for_word("circle", ("cir", "cle"), tts, store) == first
+    assert len(tts.phrases) == made
+    with open(first, "rb") as f:
+        assert b"circle?" in f.read()
+
+def test_fragments_are_shared_between_words(store):
+    tts = CountingBackend()
+    get_audio_for_word("circle", None, tts, store)
+    get_audio_for_word("foxes", None, tts, store)
+    assert tts.phrases.count("Can you spell") == 1
+
+def test_fragment_keys_keep_case(store):
+    tts = CountingBackend()
+    get_fragment("Polish", tts=tts, store=store)
+    get_fragment(" polish ", tts=tts, store=store)
+    get_fragment("polish", tts=tts, store=store)
+    assert tts.phrases == ["Polish", " polish "]
+
+def test_batched_synthesis_skips_stored_fragments(store):
+    tts = CountingBackend()
+    fragments = word_fragments("circle", ("cir", "cle"))
+    assert synthesize_fragments(fragments, tts, store) == len(fragments)
+    assert synthesize_fragments(fragments, tts, store) == 0
+
+def test_batched_synthesis_counts_only_what_it_made(store):
+    tts = CountingBackend()
+    words = [f"word{i}" for i in range(40)]
+    fragments = [(w, False) for w in words]
+    get_fragment("word3", tts=tts, store=store)
+    assert synthesize_fragments(fragments, tts, store) == 39
+    # Each backend call covers at most one small locked batch
+    assert max(len(batch) for batch in tts.batches) <= LOCKED_BATCH
+
+def test_least_recently_used_clips_are_evicted(tmp_path):
+    store = AudioStore(root=str(tmp_path / "audio"), index=str(tmp_path / "index.db"), max_mb=250 / 1024 / 1024)
+    for i in range(4):
+        store.put(store.key(i), b"x" * 100)
+    assert store.total_size() == 200
+    assert store.lookup(store.key(0)) is None and store.lookup(store.key(1)) is None
+    store.put(store.key(3), b"x" * 10)
+    assert store.total_size() == 110
+
+def test_eviction_reads_the_oldest_clips_in_batches(tmp_path):
+    store = AudioStore(root=str(tmp_path / "audio"), index=str(tmp_path / "index.db"), max_mb=1000 / 1024 / 1024)
+    keys = [store.key(i) for i in range(50)]
+    for key in keys:
+        store.put(key, b"x" * 20)
+    # One big clip pushes out more than a batch of small ones
+    store.put(store.key("big"), b"x" * 700)
+    assert store.total_size() == 1000
+    kept = [key for key in keys if store.lookup(key) is not None]
+    assert kept == keys[-15:]
+
+def test_prewarm_is_capped(store, entries, monkeypatch):
+    monkeypatch.setattr("audio.default_store", lambda: store)
+    prewarm = Prewarm(entries("foxes", "humming", "wishes"), StubBackend(), limit=2).wait(timeout=30)
+    assert (prewarm.total, prewarm.done, prewarm.failed) == (2, 2, [])
+
+class HeldBackend(CountingBackend):
+    # Blocks in synthesize() until released, so a test sees a build in flight
+    def __init__(self, fail=False):
+        super().__init__()
+        self.release = threading.Event()
+        self.fail = fail
+
+    def synthesize(self, text, slow=False, lang=LANG, tld=TLD):
+        self.release.wait(timeout=30)
+        if self.fail:
+            raise RuntimeError("TTS is down")
+        return super().synthesize(text, slow, lang, tld)
+
+def settled():
+    deadline = time.monotonic() + 30
+    while audio._pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not audio._pending
+
+def test_prefetch_builds_in_the_background_once(store, entries):
+    metrics.reset()
+    tts = HeldBackend()
+    foxes, = entries("foxes")
+    # Nothing is ready yet, and asking again while it builds doesn't queue it twice
+    assert prefetch([foxes], tts=tts, store=store) == []
+    assert prefetch([foxes], tts=tts, store=store) == []
+    tts.release.set()
+    settled()
+    assert metrics.snapshot()[1][("prefetch_builds", "")] == 1
+    assert tts.phrases.count("foxes?") == 1
+    key = word_key(foxes.word, foxes.syllables, tts, store)
+    assert prefetch([foxes], [key], tts=tts, store=store) == [store.lookup(key)]
+
+def test_a_failed_prefetch_is_counted_and_can_be_retried(store, entries):
+    metrics.reset()
+    tts = HeldBackend(fail=True)
+    foxes, = entries("foxes")
+    prefetch([foxes], tts=tts, store=store)
+    tts.release.set()
+    settled()
+    assert metrics.snapshot()[1][("prefetch_failures", "")] == 1
+    tts.fail = False
+    prefetch([foxes], tts=tts, store=store)
+    settled()
+    assert prefetch([foxes], tts=tts, store=store) == [store.lookup(word_key(foxes.word, foxes.syllables, tts, store))]
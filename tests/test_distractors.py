@@ -0,0 +1,48 @@
+import logging
+import pytest
+import distractors
+from distractors import generate, real_words
+
+@pytest.fixture
+def dictionary(monkeypatch):
+    def use(*words):
+        monkeypatch.setattr(distractors, "real_words", lambda: frozenset(words))
+        generate.cache_clear()
+    yield use
+    generate.cache_clear()
+
+def test_distractors_are_distinct_misspellings(dictionary):
+    dictionary()
+    for word in ["dropping", "station", "friend", "circle", "telegraph"]:
+        options = generate(word, count=3)
+        assert len(options) == 3
+        assert len(set(options)) == 3
+        assert word not in options
+
+def test_rules_are_taken_in_turn(dictionary):
+    dictionary()
+    assert generate("dropping") == ("droping", "droppin")
+
+def test_real_words_are_never_offered(dictionary):
+    dictionary("sin")
+    assert "sin" not in generate("sign", count=5)
+
+def test_distractors_take_the_words_casing(dictionary):
+    dictionary()
+    assert all(o[0].isupper() and o[1:].islower() for o in generate("Wednesday"))
+    assert all(o.isupper() for o in generate("NASA"))
+
+def test_short_words_and_phrases_get_none(dictionary):
+    dictionary()
+    assert generate("at") == ()
+    assert generate("ice cream") == ()
+
+def test_dictionary_is_read_lowercased(tmp_path):
+    path = tmp_path / "words"
+    path.write_text("Sign\nsin\n\n")
+    assert real_words(str(path)) == {"sign", "sin"}
+
+def test_a_missing_dictionary_is_reported(tmp_path, caplog):
+    with caplog.at_level(logging.WARNING, logger="spelltest.distractors"):
+        assert real_words(str(tmp_path / "missing")) == frozenset()
+    assert "no word list" in caplog.text
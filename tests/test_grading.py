@@ -0,0 +1,72 @@
+import random
+import pytest
+from grading import _grade, align, describe, grade, limit, regrade
+
+@pytest.mark.parametrize("word, answer, errors", [
+    ("hopping", "hoping", ("missed_double",)),
+    ("hoping", "hopping", ("extra_double",)),
+    ("friend", "freind", ("transposition",)),
+    ("circle", "cercle", ("vowel",)),
+    ("circle", "sircle", ("consonant",)),
+    ("bat", "bt", ("missing_letter",)),
+    ("station", "stasion", ("suffix",)),
+    ("cat", "dog", ("other_word",)),
+])
+def test_mistakes_are_classified(word, answer, errors):
+    result = grade(word, answer)
+    assert not result.correct
+    assert result.errors == errors
+
+def test_grading_ignores_case_and_surrounding_spaces():
+    assert grade("Wednesday", " wednesday ").correct
+    assert grade("Wednesday", "wednesday").distance == 0
+
+def test_describe_names_each_kind_once():
+    assert describe(("vowel", "vowel", "suffix")) == "used the wrong vowel, got the ending wrong"
+
+def random_pairs(count, seed=7):
+    # Words with up to three random edits each, plus some odd cases
+    rng = random.Random(seed)
+    letters = "abcdeiou"
+    words, answers = ["a", "ab", "Ab", "ab"], ["", "ba", "aB", "abc"]
+    for _ in range(count):
+        word = "".join(rng.choice(letters) for _ in range(rng.randint(1, 9)))
+        answer = list(word)
+        for _ in range(rng.randint(0, 3)):
+            i = rng.randrange(len(answer) + 1)
+            kind = rng.choice(["sub", "del", "ins", "swap"])
+            if kind == "ins" or not answer:
+                answer.insert(i, rng.choice(letters))
+            elif kind == "del":
+                del answer[min(i, len(answer) - 1)]
+            elif kind == "swap" and len(answer) > 1:
+                i = min(i, len(answer) - 2)
+                answer[i], answer[i + 1] = answer[i + 1], answer[i]
+            else:
+                answer[min(i, len(answer) - 1)] = rng.choice(letters)
+        words.append(word)
+        answers.append("".join(answer))
+    return words, answers
+
+def test_the_cutoff_only_stops_alignments_that_go_over_it():
+    for word, answer in zip(*random_pairs(300)):
+        distance, ops = align(word, answer)
+        cut, cut_ops = align(word, answer, limit(word))
+        if distance <= limit(word):
+            assert (cut, cut_ops) == (distance, ops)
+        else:
+            assert (cut, cut_ops) == (limit(word) + 1, ())
+
+def test_batch_regrade_matches_grading_one_by_one():
+    # Enough pairs that most length groups go through the NumPy path
+    words, answers = random_pairs(3000)
+    assert regrade(words, answers) == [_grade(w, a).errors for w, a in zip(words, answers)]
+
+def test_long_answers_are_another_word_without_aligning():
+    assert regrade(["circle"] * 40, ["x" * 2000] * 40) == [("other_word",)] * 40
+    assert grade("circle", "x" * 2000) == (False, 4, (), ("other_word",))
+
+def test_regrade_matches_grade():
+    words = ["hopping", "friend", "station", "circle", "friend"]
+    answers = ["hoping", "freind", "stasion", "circle", "freind"]
+    assert regrade(words, answers) == [grade(w, a).errors for w, a in zip(words, answers)]
@@ -0,0 +1,97 @@
+import sqlite3
+import pytest
+from history import DEFAULT_LEARNER, HistoryStore, list_learners, open_learner
+
+@pytest.fixture
+def store(tmp_path):
+    return HistoryStore(path=str(tmp_path / "spells.db"), legacy_file=None)
+
+def run(n, list_name="hugo"):
+    return {"date": f"2026-01-{n % 28 + 1:02d} 10:00", "list": list_name,
+            "score": f"{n} / 10", "fixes": "0 / 0", "misspellings": ""}
+
+def attempt(word, answer, correct, round=1, day="2026-01-05"):
+    return {"timestamp": f"{day} 10:00:00", "list": "hugo", "word": word, "mode": "text",
+            "answer": answer, "correct": correct, "round": round}
+
+def test_pages_cover_every_run_once_newest_first(store):
+    ids = [store.append(run(n)) for n in range(25)]
+    seen, cursor = [], None
+    while True:
+        page, cursor = store.query(before=cursor, limit=10)
+        seen += [row["id"] for row in page]
+        if cursor is None:
+            break
+    assert seen == ids[::-1]
+    assert store.count() == 25
+
+def test_query_filters_by_list_and_dates(store):
+    for n in range(10):
+        store.append(run(n, "hugo" if n % 2 else "cait"))
+    page, cursor = store.query(list_name="hugo", limit=3)
+    assert [row["score"] for row in page] == ["9 / 10", "7 / 10", "5 / 10"]
+    assert cursor == page[-1]["id"]
+    page, _ = store.query(since="2026-01-03", until="2026-01-04")
+    assert sorted(row["date"] for row in page) == ["2026-01-03 10:00", "2026-01-04 10:00"]
+
+def test_attempts_are_read_incrementally(store):
+    store.record_attempt(attempt("foxes", "foxes", True))
+    rows = store.attempts()
+    store.record_attempt(attempt("wishes", "wishs", False))
+    newer = store.attempts(after_id=rows[-1]["id"])
+    assert [row["word"] for row in newer] == ["wishes"]
+    assert [row["word"] for row in store.attempts(wrong_only=True)] == ["wishes"]
+
+def test_mistakes_are_counted_as_they_are_recorded(store):
+    store.record_attempt(attempt("friend", "freind", False))
+    store.record_attempt(attempt("friend", "frend", False))
+    store.record_attempt(attempt("hopping", "hoping", False))
+    store.record_attempt(attempt("hopping", "hopping", True))
+    stats = {s["error"]: s for s in store.error_stats("hugo")}
+    assert stats["transposition"] == {"error": "transposition", "count": 1, "words": ["friend"]}
+    assert stats["missing_letter"]["count"] == 1
+    assert stats["missed_double"]["words"] == ["hopping"]
+    words = {s["word"]: s for s in store.word_stats("hugo")}
+    assert (words["hopping"]["attempts"], words["hopping"]["correct"]) == (2, 1)
+
+def test_answers_recorded_before_mistakes_were_kept_are_graded_once(tmp_path):
+    path = str(tmp_path / "old.db")
+    db = sqlite3.connect(path)
+    db.execute("""
+        CREATE TABLE attempts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL, list TEXT NOT NULL,
+            word TEXT NOT NULL, mode TEXT NOT NULL, answer TEXT NOT NULL,
+            correct INTEGER NOT NULL, round INTEGER NOT NULL
+        )
+    """)
+    db.executemany(
+        "INSERT INTO attempts (timestamp, list, word, mode, answer, correct, round) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [("2026-01-05 10:00:00", "hugo", "dropping", "text", "dropin", 0, 1),
+         ("2026-01-05 10:00:00", "hugo", "foxes", "text", "foxes", 1, 1)],
+    )
+    db.commit()
+    db.close()
+    store = HistoryStore(path=path, legacy_file=None)
+    assert [row["errors"] for row in store.attempts()] == ["missed_double,suffix", ""]
+    assert {s["error"]: s["count"] for s in store.error_stats()} == {"missed_double": 1, "suffix": 1}
+    # Reopening doesn't count them again
+    HistoryStore(path=path, legacy_file=None)
+    assert {s["error"]: s["count"] for s in store.error_stats()} == {"missed_double": 1, "suffix": 1}
+
+def test_right_answers_push_words_back_in_the_schedule(store):
+    store.ensure_scheduled("hugo", ["foxes", "wishes"])
+    store.record_attempt(attempt("foxes", "foxes", True, day="2026-01-05"))
+    store.record_attempt(attempt("wishes", "wishs", False, day="2026-01-05"))
+    assert store.due_words("hugo", today="2026-01-05") == ["wishes"]
+    assert sorted(store.due_words("hugo", today="2026-01-06")) == ["foxes", "wishes"]
+    # Round 2 corrections don't move a word
+    store.record_attempt(attempt("wishes", "wishes", True, round=2, day="2026-01-05"))
+    assert store.due_words("hugo", today="2026-01-05") == ["wishes"]
+
+def test_each_learner_has_their_own_shard(tmp_path):
+    results = str(tmp_path / "results")
+    open_learner("Bob", results).append(run(1))
+    open_learner("Zoë / 5B", results)
+    assert list_learners(results) == [DEFAULT_LEARNER, "Bob", "Zoë / 5B"]
+    assert open_learner("Bob", results).count() == 1
+    assert open_learner("Zoë / 5B", results).count() == 0
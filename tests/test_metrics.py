@@ -0,0 +1,81 @@
+import logging
+import socket
+import urllib.request
+import pytest
+import metrics
+
+@pytest.fixture(autouse=True)
+def fresh(monkeypatch):
+    metrics.reset()
+    monkeypatch.setattr(metrics, "_server", None)
+    metrics._local.rerun = None
+    yield
+    if metrics._server is not None:
+        metrics._server.shutdown()
+        metrics._server.server_close()
+    metrics.reset()
+
+def test_timers_and_counters():
+    @metrics.timer("work")
+    def work():
+        return 42
+    assert work() == 42
+    with metrics.timed("work"):
+        pass
+    metrics.cache_hit("fragment", True)
+    metrics.cache_hit("fragment", True)
+    metrics.cache_hit("fragment", False)
+    timers, counters = metrics.snapshot()
+    assert timers["work"]["calls"] == 2
+    assert timers["work"]["max_s"] <= timers["work"]["total_s"]
+    assert counters[("cache_hits", "fragment")] == 2
+    assert metrics.hit_rate("fragment") == pytest.approx(2 / 3)
+    assert metrics.hit_rate("word_clip") is None
+
+def test_a_rerun_collects_its_own_stages(monkeypatch, caplog):
+    monkeypatch.setenv("SPELLTEST_METRICS_LOG", "1")
+    metrics.observe("audio", 0.5)  # outside any rerun
+    metrics.begin_rerun()
+    metrics.observe("audio", 0.25)
+    metrics.observe("audio", 0.25)
+    with caplog.at_level(logging.INFO, logger="spelltest.metrics"):
+        total, stages = metrics.end_rerun()
+    assert stages == {"audio": 0.5}
+    assert '"event": "rerun"' in caplog.text
+    assert metrics.snapshot()[0]["rerun"]["calls"] == 1
+    # Closing twice doesn't count twice
+    assert metrics.end_rerun() == (0.0, {})
+    assert metrics.snapshot()[0]["rerun"]["calls"] == 1
+
+def test_a_rerun_left_open_is_counted_as_unfinished():
+    metrics.begin_rerun()
+    metrics.begin_rerun()
+    metrics.end_rerun()
+    _, counters = metrics.snapshot()
+    assert counters[("reruns_unfinished", "")] == 1
+    assert metrics.snapshot()[0]["rerun"]["calls"] == 1
+
+def test_prometheus_text():
+    metrics.observe("audio", 0.5)
+    metrics.cache_hit("fragment", False)
+    metrics.count("prefetch_builds")
+    text = metrics.prometheus_text()
+    assert 'spelltest_stage_seconds_total{stage="audio"} 0.500000' in text
+    assert 'spelltest_stage_calls_total{stage="audio"} 1' in text
+    assert 'spelltest_cache_misses_total{cache="fragment"} 1' in text
+    assert "spelltest_prefetch_builds_total 1" in text
+
+def test_the_endpoint_serves_metrics():
+    metrics.observe("audio", 0.5)
+    server = metrics.serve(0, host="127.0.0.1")
+    assert metrics.serve(0, host="127.0.0.1") is server
+    with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics") as response:
+        assert 'stage="audio"' in response.read().decode("utf-8")
+
+def test_a_busy_port_is_logged_not_raised(caplog):
+    with socket.socket() as taken:
+        taken.bind(("127.0.0.1", 0))
+        taken.listen()
+        with caplog.at_level(logging.WARNING, logger="spelltest.metrics"):
+            assert metrics.serve(taken.getsockname()[1], host="127.0.0.1") is None
+    assert "metrics endpoint not started" in caplog.text
@@ -0,0 +1,83 @@
+import pytest
+from quiz import QuizError, QuizSession
+
+WORDS = [
+    {"word": "foxes", "spell": ["foxs", "foxxes"]},
+    {"word": "wishes", "spell": ["wishis", "wishs"]},
+    "humming",
+    "dropping",
+]
+
+def test_answer_and_next_move_through_the_states(entries):
+    quiz = QuizSession(entries(*WORDS), seed=1, modes=("text",))
+    assert quiz.state == quiz.ASKING
+    assert quiz.question_number == 1 and quiz.total == 4
+    assert quiz.answer(" FOXES ")
+    assert quiz.state == quiz.ANSWERED
+    assert quiz.last_attempt == {"word": "foxes", "mode": "text", "answer": " FOXES ", "correct": True, "round": 1}
+    assert quiz.next() == quiz.ASKING
+    assert quiz.current.word == "wishes"
+
+def test_out_of_order_transitions_raise(entries):
+    quiz = QuizSession(entries(*WORDS), seed=1)
+    with pytest.raises(QuizError):
+        quiz.next()
+    with pytest.raises(QuizError):
+        quiz.start_round_2()
+    quiz.answer("wrong")
+    with pytest.raises(QuizError):
+        quiz.answer("wrong")
+
+def test_mistakes_are_asked_again_in_round_2(entries):
+    quiz = QuizSession(entries(*WORDS), seed=1, modes=("text",))
+    for answer in ["foxes", "wishs", "humming", "droping"]:
+        quiz.answer(answer)
+        quiz.next()
+    assert quiz.in_round_2
+    assert [e.word for e in quiz.words] == ["wishes", "dropping"]
+    assert quiz.misspelt == [("wishes", "text", "wishs"), ("dropping", "text", "droping")]
+    quiz.answer("wishes")
+    quiz.next()
+    quiz.answer("dropin")
+    assert quiz.next() == quiz.DONE
+    assert quiz.summary() == {"score": "2 / 4", "fixes": "1 / 2"}
+
+def test_a_perfect_round_finishes_without_round_2(entries):
+    quiz = QuizSession(entries(*WORDS), seed=1)
+    while not quiz.done:
+        quiz.answer(quiz.current.word)
+        quiz.next()
+    assert quiz.round == 1
+    with pytest.raises(QuizError):
+        quiz.answer("foxes")
+    assert quiz.summary() == {"score": "4 / 4", "fixes": "0 / 0"}
+
+def test_the_same_seed_replays_the_same_test(entries):
+    words = entries(*WORDS)
+    first = QuizSession(words, seed=42, modes=("text", "mc", "missing"), shuffle=True)
+    again = QuizSession(words, seed=42, modes=("text", "mc", "missing"), shuffle=True)
+    assert first.plan == again.plan
+    assert [q.entry.word for q in first.upcoming(10)] == [e.word for e in first.words[1:]]
+
+def test_multiple_choice_offers_the_word_and_its_distractors(entries):
+    quiz = QuizSession(entries(*WORDS[:2]), seed=3, modes=("mc",))
+    for question in quiz.plan:
+        assert sorted(question.options) == sorted((question.entry.word,) + question.entry.distractors)
+
+def test_missing_letters_fill_the_blanks_in_order(entries):
+    quiz = QuizSession(entries("dropping"), seed=5, modes=("missing",), blanks=3)
+    assert len(quiz.blanks) == 3
+    assert quiz.pattern.count("_") == 3
+    letters = "".join(quiz.current.word[i] for i in quiz.blanks)
+    assert quiz.fill(" ".join(letters)) == "dropping"
+    with pytest.raises(QuizError):
+        quiz.fill(letters[:-1])
+
+def test_audio_keys_are_planned_with_the_questions(entries):
+    quiz = QuizSession(entries(*WORDS), seed=1, audio_key=lambda entry: entry.word.upper())
+    assert [q.audio for q in quiz.plan] == ["FOXES", "WISHES", "HUMMING", "DROPPING"]
+
+def test_empty_lists_and_unknown_modes(entries):
+    assert QuizSession([], seed=1).done
+    with pytest.raises(QuizError):
+        QuizSession(entries(*WORDS), modes=("spoken",))
@@ -0,0 +1,59 @@
+import os
+import stat
+import sys
+import pytest
+import tts_backends
+from tts_backends import TTS_BACKENDS, PiperBackend, StubBackend, TTSBackend, get_backend
+
+# Stands in for the piper command: one "WAV" per stdin line, holding the
+# speed it was asked for, its path printed like piper does
+FAKE_PIPER = """\
+import os, sys
+args = sys.argv[1:]
+out_dir, scale = args[args.index("--output_dir") + 1], args[args.index("--length_scale") + 1]
+with open(os.path.join(out_dir, "..", "runs"), "a") as runs:
+    runs.write(scale + "\\n")
+for i, line in enumerate(sys.stdin):
+    path = os.path.join(out_dir, f"{i}.wav")
+    with open(path, "w") as f:
+        f.write(f"{scale} {line.strip()}")
+    print(path)
+"""
+
+@pytest.fixture
+def piper(tmp_path, monkeypatch):
+    script = tmp_path / "piper"
+    script.write_text(f"#!{sys.executable}\n" + FAKE_PIPER, encoding="utf-8")
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    # Keeps the clips readable; converting needs ffmpeg
+    monkeypatch.setattr(tts_backends, "wav_to_mp3", lambda data: data)
+    monkeypatch.setattr(tts_backends.tempfile, "tempdir", str(tmp_path / "work"))
+    os.makedirs(tmp_path / "work")
+    return PiperBackend(command=str(script), model="voices/en_GB-alba.onnx"), tmp_path / "work" / "runs"
+
+def test_backends_are_chosen_by_name():
+    assert get_backend("stub") is get_backend("stub")
+    assert isinstance(get_backend("stub"), StubBackend)
+    # SPELLTEST_TTS is "stub" under the tests
+    assert isinstance(get_backend(), StubBackend)
+    assert set(TTS_BACKENDS) == {"gtts", "stub", "espeak", "piper"}
+    with pytest.raises(ValueError, match="unknown TTS backend 'festival'"):
+        get_backend("festival")
+
+def test_a_batch_defaults_to_one_phrase_at_a_time():
+    class Echo(TTSBackend):
+        def synthesize(self, text, slow=False, lang=tts_backends.LANG, tld=tts_backends.TLD):
+            return f"{text}{' slow' if slow else ''}".encode()
+    assert Echo().synthesize_batch([("cir", True), ("circle", False)]) == [b"cir slow", b"circle"]
+
+def test_piper_needs_a_voice(monkeypatch):
+    monkeypatch.delenv("SPELLTEST_PIPER_MODEL", raising=False)
+    with pytest.raises(ValueError, match="SPELLTEST_PIPER_MODEL"):
+        PiperBackend()
+
+def test_piper_runs_once_per_speed_and_keeps_the_order(piper):
+    backend, runs = piper
+    assert backend.name == "piper:en_GB-alba.onnx"
+    clips = backend.synthesize_batch([("Can you spell", False), ("cir", True), ("circle?", False), ("cle", True)])
+    assert clips == [b"1.0 Can you spell", b"1.6 cir", b"1.0 circle?", b"1.6 cle"]
+    assert runs.read_text().split() == ["1.0", "1.6"]
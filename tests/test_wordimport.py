@@ -0,0 +1,60 @@
+import io
+import pytest
+from wordimport import export_list, import_lists, main
+from wordlists import WordListError, load_word_lists
+
+WORDS_YAML = """\
+hugo:
+  - word: foxes
+    spell: ["foxs", "foxxes"]
+  - humming
+"""
+
+@pytest.fixture
+def app(tmp_path):
+    words = tmp_path / "words.yaml"
+    words.write_text(WORDS_YAML, encoding="utf-8")
+    return str(words), str(tmp_path / "lists")
+
+def test_csv_import_is_loaded_with_the_app_lists(app):
+    words, lists_dir = app
+    errors = []
+    source = io.StringIO("word,spell,syll\nstation,stashun|stasion,\ncircle,,cir|cle\nStation,,\n,,\n")
+    writers = import_lists(source, "csv", "Year 5", lists_dir, errors)
+    assert [(w.name, w.count, w.duplicates) for w in writers] == [("Year 5", 2, 1)]
+    lists = load_word_lists(words, lists_dir)
+    assert set(lists) == {"hugo", "Year 5"}
+    station, circle = lists["Year 5"]
+    assert station.distractors == ("stashun", "stasion")
+    assert circle.syllables == ("cir", "cle")
+    assert circle.distractors
+
+def test_invalid_entries_are_skipped_and_reported(app):
+    _, lists_dir = app
+    errors = []
+    import_lists(io.StringIO("- word: ok\n- spell: [x]\n"), "yaml", "Mixed", lists_dir, errors)
+    assert len(errors) == 1 and "'word' is missing" in errors[0]
+    with pytest.raises(WordListError):
+        import_lists(io.StringIO("- spell: [x]\n"), "yaml", "Strict", lists_dir)
+
+@pytest.mark.parametrize("fmt", ["csv", "yaml", "txt"])
+def test_export_then_import_round_trips(app, fmt):
+    words, lists_dir = app
+    original = load_word_lists(words, lists_dir)["hugo"]
+    out = io.StringIO()
+    export_list(original, out, fmt, "Copy")
+    out.seek(0)
+    import_lists(out, fmt, "Copy", lists_dir)
+    copy = load_word_lists(words, lists_dir)["Copy"]
+    assert [e.word for e in copy] == [e.word for e in original]
+    if fmt != "txt":
+        # Plain text only carries the words
+        assert copy == original
+
+def test_cli_exports_to_a_file(app, tmp_path, capsys):
+    words, lists_dir = app
+    out = tmp_path / "hugo.txt"
+    assert main(["export", "hugo", "--format", "txt", "-o", str(out), "--words", words, "--lists-dir", lists_dir]) == 0
+    assert out.read_text(encoding="utf-8") == "foxes\nhumming\n"
+    assert main(["export", "nope", "--words", words, "--lists-dir", lists_dir]) == 2
+    assert "no list named" in capsys.readouterr().err
@@ -0,0 +1,118 @@
+import os
+import pytest
+import wordlists
+from wordlists import WordListError, load_word_lists, parse_word_lists
+
+WORDS_YAML = """\
+hugo:
+  - word: foxes
+    spell: ["foxs", "foxxes"]
+  - humming
+"""
+
+@pytest.fixture
+def app(tmp_path):
+    words = tmp_path / "words.yaml"
+    words.write_text(WORDS_YAML, encoding="utf-8")
+    return words, str(tmp_path / "lists")
+
+def test_lists_are_kept_until_the_file_changes(app):
+    words, lists_dir = app
+    first = load_word_lists(str(words), lists_dir)
+    assert load_word_lists(str(words), lists_dir) is first
+    # A new mtime alone means a re-read, not a re-parse
+    os.utime(words, ns=(1, 1))
+    assert load_word_lists(str(words), lists_dir) is first
+    words.write_text(WORDS_YAML + "cait:\n  - circle\n", encoding="utf-8")
+    again = load_word_lists(str(words), lists_dir)
+    assert set(again) == {"hugo", "cait"}
+    assert again.digest != first.digest
+    assert again.digests["hugo"] == again.digests["cait"]
+
+def test_a_new_list_file_does_not_reparse_words_yaml(app, monkeypatch):
+    words, lists_dir = app
+    load_word_lists(str(words), lists_dir)
+    monkeypatch.setattr(wordlists, "_parse_yaml", lambda *args: pytest.fail("words.yaml was parsed again"))
+    os.makedirs(lists_dir)
+    with open(wordlists.list_path("Year 5", lists_dir), "w", encoding="utf-8") as f:
+        f.write(wordlists.entry_record(wordlists.parse_entry("circle", "entry 1")) + "\n")
+    lists = load_word_lists(str(words), lists_dir)
+    assert set(lists) == {"hugo", "Year 5"}
+    assert lists.digests["Year 5"] != lists.digests["hugo"]
+
+@pytest.mark.parametrize("data, message", [
+    (["foxes"], "must map list names"),
+    ({"hugo": "foxes"}, "expected a list of words"),
+    ({"hugo": [{"spell": ["foxs"]}]}, "'word' is missing"),
+    ({"hugo": [{"word": "foxes", "sound": "x"}]}, "unknown key(s) sound"),
+    ({"hugo": [{"word": "foxes", "spell": "foxs"}]}, "'spell' must be a list"),
+    ({"hugo": [3]}, "expected a mapping"),
+])
+def test_invalid_lists_are_rejected(data, message):
+    with pytest.raises(WordListError) as error:
+        parse_word_lists(data)
+    assert message in str(error.value)
+
+def test_a_bad_edit_is_reported_by_the_loader(app):
+    words, lists_dir = app
+    load_word_lists(str(words), lists_dir)
+    words.write_text("hugo:\n  - word: foxes\n    spel: [foxs]\n", encoding="utf-8")
+    with pytest.raises(WordListError, match="list 'hugo', entry 1"):
+        load_word_lists(str(words), lists_dir)
+
+def test_the_hyphenator_is_loaded_once_per_language():
+    assert wordlists.hyphenator("en") is wordlists.hyphenator("en")
+
+def test_syllables_are_worked_out_once_when_a_list_is_built(app, monkeypatch):
+    split, calls = wordlists.split_syllables, []
+    monkeypatch.setattr(wordlists, "split_syllables", lambda word: calls.append(word) or split(word))
+    circle = wordlists.parse_entry({"word": "circle", "syll": ["cir", "cle"]}, "entry 1")
+    assert circle.syllables == ("cir", "cle") and calls == []
+    humming = wordlists.parse_entry("humming", "entry 2")
+    assert humming.syllables == split("humming") and calls == ["humming"]
+    # An imported list keeps them, so loading it splits nothing
+    words, lists_dir = app
+    os.makedirs(lists_dir)
+    with open(wordlists.list_path("Year 5", lists_dir), "w", encoding="utf-8") as f:
+        f.write("".join(wordlists.entry_record(e) + "\n" for e in (circle, humming)))
+    monkeypatch.setattr(wordlists, "_parse_yaml", lambda raw, path, digest: {})
+    assert load_word_lists(str(words), lists_dir)["Year 5"] == (circle, humming)
+    assert calls == ["humming"]
+
+@pytest.fixture
+def fresh_process(monkeypatch):
+    # What a newly started server has: nothing parsed in memory
+    def start():
+        monkeypatch.setattr(wordlists, "_cache", {})
+        monkeypatch.setattr(wordlists, "_merged", {})
+    return start
+
+def test_a_new_process_reads_the_compiled_lists(app, fresh_process, monkeypatch):
+    words, lists_dir = app
+    first = load_word_lists(str(words), lists_dir)
+    assert os.path.exists(wordlists.compiled_path(str(words)))
+    fresh_process()
+    monkeypatch.setattr(wordlists, "parse_word_lists", lambda data: pytest.fail("words.yaml was compiled again"))
+    assert load_word_lists(str(words), lists_dir) == first
+
+@pytest.mark.parametrize("change", ["words", "version", "dictionary"])
+def test_the_compiled_lists_are_rebuilt_when_an_input_changes(app, fresh_process, monkeypatch, tmp_path, change):
+    words, lists_dir = app
+    load_word_lists(str(words), lists_dir)
+    fresh_process()
+    if change == "words":
+        words.write_text(WORDS_YAML + "  - dropping\n", encoding="utf-8")
+    elif change == "version":
+        monkeypatch.setattr(wordlists, "COMPILER_VERSION", wordlists.COMPILER_VERSION + 1)
+    else:
+        other = tmp_path / "dict"
+        other.write_text("foxes\n", encoding="utf-8")
+        monkeypatch.setattr(wordlists.distractors, "DICT_FILE", str(other))
+    parse, compiled = wordlists.parse_word_lists, []
+    monkeypatch.setattr(wordlists, "parse_word_lists", lambda data: compiled.append(data) or parse(data))
+    load_word_lists(str(words), lists_dir)
+    assert len(compiled) == 1
+    # The next process reads the new build
+    fresh_process()
+    load_word_lists(str(words), lists_dir)
+    assert len(compiled) == 1
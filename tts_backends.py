@@ -0,0 +1,133 @@
+import functools
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+LANG = "en"
+TLD = "co.uk"
+
+# ------------------ INTERFACE ------------------
+# A backend turns text into MP3 bytes. `name` goes into the audio cache keys,
+# so it must change whenever the voice does. Backends that are cheaper per
+# call with many phrases at once set `batch_size` > 1 and override
+# synthesize_batch; the pre-warm then sends a whole list's prompts and
+# syllables through in as few calls as possible.
+class TTSBackend:
+    name = "base"
+    batch_size = 1
+
+    def synthesize(self, text, slow=False, lang=LANG, tld=TLD):
+        raise NotImplementedError
+
+    def synthesize_batch(self, phrases, lang=LANG, tld=TLD):
+        # phrases: list of (text, slow); returns MP3 bytes in the same order
+        return [self.synthesize(text, slow, lang, tld) for text, slow in phrases]
+
+def wav_to_mp3(data):
+    # Local engines produce WAV; word clips are joined from MP3 fragments
+    from pydub import AudioSegment
+    out = io.BytesIO()
+    AudioSegment.from_file(io.BytesIO(data), format="wav").export(out, format="mp3")
+    return out.getvalue()
+
+# ------------------ BACKENDS ------------------
+class GTTSBackend(TTSBackend):
+    name = "gtts"
+
+    def synthesize(self, text, slow=False, lang=LANG, tld=TLD):
+        from gtts import gTTS
+        fp = io.BytesIO()
+        tts = gTTS(text=text, lang=lang, tld=tld, slow=slow)
+        tts.write_to_fp(fp)
+        fp.seek(0)
+        return fp.read()
+
+# Local stand-in so the pipeline can run without network access (tests, benchmarks)
+class StubBackend(TTSBackend):
+    name = "stub"
+    batch_size = 1000
+
+    def synthesize(self, text, slow=False, lang=LANG, tld=TLD):
+        return f"[{lang}-{tld}{' slow' if slow else ''}] {text}\n".encode("utf-8")
+
+# Offline, via the espeak-ng command line (apt install espeak-ng ffmpeg).
+# espeak-ng starts in a few milliseconds, so a batch is simply run on a few
+# processes at once.
+class EspeakBackend(TTSBackend):
+    batch_size = 64
+
+    def __init__(self, command=None, voice=None, workers=4):
+        self.command = command or os.environ.get("SPELLTEST_ESPEAK", "espeak-ng")
+        self.voice = voice or os.environ.get("SPELLTEST_ESPEAK_VOICE", "en-gb")
+        self.workers = workers
+        self.name = f"espeak:{self.voice}"
+
+    def synthesize(self, text, slow=False, lang=LANG, tld=TLD):
+        proc = subprocess.run(
+            [self.command, "-v", self.voice, "-s", "110" if slow else "150", "--stdout", text],
+            capture_output=True, check=True,
+        )
+        return wav_to_mp3(proc.stdout)
+
+    def synthesize_batch(self, phrases, lang=LANG, tld=TLD):
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(lambda p: self.synthesize(p[0], p[1], lang, tld), phrases))
+
+# Offline neural voice via the piper command line. Piper loads its model once
+# and then reads one phrase per stdin line, writing one WAV per line into
+# --output_dir and printing each path, so a whole batch is one process.
+class PiperBackend(TTSBackend):
+    batch_size = 500
+    SLOW_LENGTH_SCALE = "1.6"
+
+    def __init__(self, command=None, model=None):
+        self.command = command or os.environ.get("SPELLTEST_PIPER", "piper")
+        self.model = model or os.environ.get("SPELLTEST_PIPER_MODEL")
+        if not self.model:
+            raise ValueError("set SPELLTEST_PIPER_MODEL to a piper .onnx voice")
+        self.name = f"piper:{os.path.basename(self.model)}"
+
+    def synthesize(self, text, slow=False, lang=LANG, tld=TLD):
+        return self.synthesize_batch([(text, slow)], lang, tld)[0]
+
+    def synthesize_batch(self, phrases, lang=LANG, tld=TLD):
+        results = [None] * len(phrases)
+        # Speed is per process, so normal and slow phrases go in separate runs
+        for slow in (False, True):
+            indices = [i for i, (_, s) in enumerate(phrases) if s == slow]
+            if not indices:
+                continue
+            out_dir = tempfile.mkdtemp(prefix="piper-")
+            try:
+                proc = subprocess.run(
+                    [self.command, "--model", self.model, "--output_dir", out_dir,
+                     "--length_scale", self.SLOW_LENGTH_SCALE if slow else "1.0"],
+                    input="".join(" ".join(phrases[i][0].split()) + "\n" for i in indices),
+                    capture_output=True, text=True, check=True,
+                )
+                paths = [line.strip() for line in proc.stdout.splitlines() if line.strip()]
+                if len(paths) != len(indices):
+                    raise RuntimeError(f"piper returned {len(paths)} clips for {len(indices)} phrases")
+                for i, path in zip(indices, paths):
+                    with open(path, "rb") as f:
+                        results[i] = wav_to_mp3(f.read())
+            finally:
+                shutil.rmtree(out_dir, ignore_errors=True)
+        return results
+
+TTS_BACKENDS = {
+    "gtts": GTTSBackend,
+    "stub": StubBackend,
+    "espeak": EspeakBackend,
+    "piper": PiperBackend,
+}
+
+@functools.lru_cache(maxsize=None)
+def get_backend(name=None):
+    name = name or os.environ.get("SPELLTEST_TTS", "gtts")
+    if name not in TTS_BACKENDS:
+        raise ValueError(f"unknown TTS backend {name!r}, expected one of {', '.join(TTS_BACKENDS)}")
+    return TTS_BACKENDS[name]()
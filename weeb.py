@@ -1,14 +1,24 @@
 import streamlit as st
-import yaml
-import json
 import os
 from datetime import datetime
-import random
-from gtts import gTTS
-import pyphen
-import io
-import tempfile
-from streamlit_javascript import st_javascript
+from audio import get_audio_for_word, audio_url, word_key, prefetch, Prewarm, PREFETCH
+from history import list_learners, open_learner
+from wordlists import load_word_lists, WordListError
+from grading import grade, describe, ERRORS
+from quiz import QuizSession, QuizError, DEFAULT_MODES, DEFAULT_BLANKS
+import metrics
+
+metrics.begin_rerun()
+
+# st.rerun() and st.stop() end the script by raising, so the rerun is timed
+# before they're called; every click that changes the page exits this way
+def rerun():
+    metrics.end_rerun()
+    st.rerun()
+
+def stop():
+    metrics.end_rerun()
+    st.stop()
 
 st.set_page_config(
     page_title="Slay Spells",
@@ -18,77 +28,120 @@ st.set_page_config(
 )
 
 # ------------------ LOAD WORDS ------------------
-with open("words.yaml", "r") as f:
-    WORD_LISTS = yaml.safe_load(f)
+try:
+    WORD_LISTS = load_word_lists()
+except WordListError as e:
+    st.error(f"The word lists have a problem: {e}")
+    stop()
+
+# Optional Prometheus endpoint on SPELLTEST_METRICS_PORT
+@st.cache_resource(show_spinner=False)
+def start_metrics_server():
+    return metrics.serve_from_env()
 
-HISTORY_FILE = "spells.json"
-if not os.path.exists(HISTORY_FILE):
-    with open(HISTORY_FILE, "w") as f:
-        json.dump([], f)
-with open(HISTORY_FILE, "r") as f:
-    history = json.load(f)
+start_metrics_server()
+
+# One store per learner, opened once per process and shared by their sessions
+@st.cache_resource(show_spinner=False)
+def get_history_store(learner):
+    return open_learner(learner)
 
 def save_history(entry):
     history.append(entry)
-    with open(HISTORY_FILE, "w") as f:
-        json.dump(history, f, indent=2)
+    # Drop the loaded history pages so the panel picks up the new result
+    st.session_state.pop("history_rows", None)
+
+def record_attempt(attempt):
+    # Tagged with the list the test was built from
+    history.record_attempt(dict(attempt, list=st.session_state.quiz_list))
 
 # ------------------ SIDEBAR ----------------------
 st.sidebar.title("⚙️ Settings")
+
+def switch_learner():
+    # A test belongs to one learner, so switching starts a fresh one
+    for key in ["quiz", "saved", "history_rows", "history_filter", "history_cursor"]:
+        st.session_state.pop(key, None)
+
+learners = list_learners()
+# A learner added below is selected on the next run, before the widget exists
+if "pending_learner" in st.session_state:
+    st.session_state.learner = st.session_state.pop("pending_learner")
+learner = st.sidebar.selectbox("Learner:", learners, key="learner", on_change=switch_learner)
+with st.sidebar.expander("➕ Add a learner"):
+    with st.form("add_learner", clear_on_submit=True):
+        name = st.text_input("Name", max_chars=40)
+        if st.form_submit_button("Add") and name.strip():
+            get_history_store(name.strip())
+            switch_learner()
+            st.session_state.pending_learner = name.strip()
+            rerun()
+history = get_history_store(learner)
+
 list_choice = st.sidebar.selectbox(
     "Choose a word list:",
     list(WORD_LISTS.keys())
 )
 shuffle = st.sidebar.checkbox("Shuffle words", value=True)
+spaced = st.sidebar.checkbox("Only words due for practice", value=False,
+                             help="Spaced repetition: words you get right come back less often")
+if spaced:
+    max_words = st.sidebar.number_input("Max words per test", min_value=1, value=10)
+MODE_NAMES = {"text": "Type the word", "mc": "Multiple choice", "missing": "Missing letters"}
+modes = st.sidebar.multiselect("Question types:", list(MODE_NAMES), default=list(DEFAULT_MODES),
+                               format_func=MODE_NAMES.get) or list(DEFAULT_MODES)
+blanks = DEFAULT_BLANKS
+if "missing" in modes:
+    blanks = st.sidebar.number_input("Missing letters per word", min_value=1, max_value=20, value=DEFAULT_BLANKS)
+
+# Pre-generate audio for the start of the list in the background, once per
+# process. Keyed on the digest of the list's file so editing it starts a
+# fresh pre-warm
+@st.cache_resource(show_spinner=False)
+def start_prewarm(list_name, digest):
+    return Prewarm(WORD_LISTS[list_name])
+
+prewarm = start_prewarm(list_choice, WORD_LISTS.digests[list_choice])
+if not prewarm.finished:
+    st.sidebar.progress(prewarm.progress(), text=f"🔊 Preparing audio {prewarm.done} / {prewarm.total}")
+if prewarm.failed:
+    st.sidebar.warning(f"Audio failed for {len(prewarm.failed)} word(s), will retry when asked")
 st.sidebar.markdown("---")
 if st.sidebar.button("🔄 Reset Test"):
-    st.session_state.clear()
-    st.rerun()
+    # Keep the learner selected
+    for key in list(st.session_state.keys()):
+        if key != "learner":
+            del st.session_state[key]
+    rerun()
 
 # ------------------ SESSION STATE INIT ------------------
-if "index" not in st.session_state:
-    st.session_state.index = 0
-if "score" not in st.session_state:
-    st.session_state.score = 0
-if "scoretwo" not in st.session_state:
-    st.session_state.scoretwo = 0
-if "done" not in st.session_state:
-    st.session_state.done = False
-if "words" not in st.session_state:
-    words = WORD_LISTS[list_choice][:]
-    if shuffle:
-        random.shuffle(words)
-    st.session_state.words = words
-    st.session_state.originalwords = words
-if "redo_words" not in st.session_state:
-    st.session_state.redo_words = []
-if "in_round_2" not in st.session_state:
-    st.session_state.in_round_2 = False
-if "missing_1" not in st.session_state:
-    st.session_state.missing_1 = 0
-if "missing_2" not in st.session_state:
-    st.session_state.missing_2 = 0
-if "missing_3" not in st.session_state:
-    st.session_state.missing_3 = 0
-
-# Per-word state
-if "submitted" not in st.session_state:
-    st.session_state.submitted = False
-if "current_mode" not in st.session_state:
-    st.session_state.current_mode = None
-if "audio_file" not in st.session_state:
-    st.session_state.audio_file = None
-
-# Multiple choice specific
-if "mc_options" not in st.session_state:
-    st.session_state.mc_options = None
-if "mc_selection" not in st.session_state:
-    st.session_state.mc_selection = None
-
-# Misspelt words
-if "misspelt" not in st.session_state:
-    st.session_state.misspelt = ""
-    
+# Once per learner and list per process; each learner has their own schedule
+@st.cache_resource(show_spinner=False)
+def seed_schedule(learner, list_name, words):
+    get_history_store(learner).ensure_scheduled(list_name, words)
+
+# A test belongs to one list, so picking another starts a fresh one
+if st.session_state.get("quiz_list") != list_choice:
+    for key in ["quiz", "saved"]:
+        st.session_state.pop(key, None)
+
+if "quiz" not in st.session_state:
+    if spaced:
+        seed_schedule(learner, list_choice, tuple(w.word for w in WORD_LISTS[list_choice]))
+        by_word = {w.word: w for w in WORD_LISTS[list_choice]}
+        words = [by_word[w] for w in history.due_words(list_choice, limit=max_words) if w in by_word]
+    else:
+        words = list(WORD_LISTS[list_choice])
+    # ?seed=N replays a session shown in the debug panel
+    seed = int(st.query_params["seed"]) if st.query_params.get("seed", "").isdigit() else None
+    st.session_state.quiz = QuizSession(
+        words, seed=seed, modes=modes, blanks=blanks, shuffle=shuffle,
+        audio_key=lambda entry: word_key(entry.word, entry.syllables),
+    )
+    st.session_state.quiz_list = list_choice
+    st.session_state.saved = False
+quiz = st.session_state.quiz
+
 # ------------------ HEADER ------------------------
 st.markdown("""
     <h1 style='text-align:center; color:#ff66a6;'>
@@ -96,408 +149,189 @@ st.markdown("""
     </h1>
 """, unsafe_allow_html=True)
 
-# ------------------ AUDIO HELPERS ------------------
-AUDIO_DIR = "audio"
-os.makedirs(AUDIO_DIR, exist_ok=True)
-
-def get_audio_for_word(word, syllables=None):
-    safe_name = word.replace(" ", "_").lower()
-    filename = os.path.join(AUDIO_DIR, f"{safe_name}.mp3")
-    # To deal with redoing the mp3
-    #if safe_name == "criticise":
-    #    st.info("Redo")
-    #else:
-    if os.path.exists(filename):
-        return filename
-    # Generate MP3
-    final_bytes = b""
-    def tts_bytes(text, slow=False):
-        fp = io.BytesIO()
-        tts = gTTS(text=text, lang="en", tld="co.uk", slow=slow)
-        tts.write_to_fp(fp)
-        fp.seek(0)
-        return fp.read()
-    final_bytes += tts_bytes(f"Can you spell {word}?")
-    if syllables and len(syllables) > 1:
-        for s in syllables:
-            final_bytes += tts_bytes(s, slow=True)
-    with open(filename, "wb") as f:
-        f.write(final_bytes)
-    return filename
-
+def question_audio(entry):
+    # A TTS or network error mustn't take the question down: it is shown
+    # without audio while the clip is retried in the background
+    try:
+        return get_audio_for_word(entry.word, entry.syllables)
+    except Exception:
+        metrics.count("audio_failures")
+        prefetch([entry])
+        return None
+
+def play_audio(mp3_file):
+    if mp3_file is None:
+        st.warning("🔇 The audio for this word couldn't be made just now.")
+        st.button("🔁 Try the audio again")
+        return
+    # Point the browser at the static URL (cacheable, ETag and Range handled
+    # by Streamlit's static file route) instead of re-sending the MP3 bytes
+    # through the media manager on every rerun.
+    url = audio_url(mp3_file)
+    if url is not None and st.get_option("server.enableStaticServing"):
+        st.markdown(f'<audio controls preload="auto" src="{url}"></audio>', unsafe_allow_html=True)
+    else:
+        st.audio(mp3_file)
+
+def preload_audio(questions):
+    # Build the next questions' clips on the server and have the browser
+    # fetch the ones that are ready, so the next word plays straight away
+    files = prefetch([q.entry for q in questions], [q.audio for q in questions])
+    urls = [url for url in map(audio_url, files) if url is not None]
+    if urls and st.get_option("server.enableStaticServing"):
+        st.markdown("".join(f'<audio preload="auto" src="{url}" hidden></audio>' for url in urls),
+                    unsafe_allow_html=True)
+
+ANSWER_LABELS = {"text": "typed", "mc": "selected", "missing": "filled"}
+# Longer than any word; keeps a pasted essay out of the history and grading
+MAX_ANSWER_CHARS = 100
+
+def submit_answer(answer):
+    quiz.answer(answer)
+    record_attempt(quiz.last_attempt)
+    rerun()
 
 # ------------------ MAIN APP ----------------------
-if st.session_state.done:
-    if len(st.session_state.words) > 0:
-        fixes = len(st.session_state.words)
-        score = st.session_state.score
-        scoretwo = st.session_state.scoretwo
-        total = len(st.session_state.originalwords)
-        misspellings = st.session_state.misspelt
+if quiz.done:
+    if len(quiz.original_words) == 0:
+        st.success("🎉 Nothing due for practice in this list today. Come back tomorrow!")
+    elif not st.session_state.saved:
+        result = quiz.summary()
         st.success(f"📊 All done!")
-        if st.session_state.in_round_2:
-            st.success(f"⭐ You scored **{scoretwo} / {total}**")
-            st.success(f"🔧 You fixed **{score} / {fixes}**")
-            scoretext = f"{scoretwo} / {total}"
-            fixtext = f"{score} / {fixes}"
-        else:
-            st.success(f"⭐ You scored **{score} / {total}**")
-            scoretext = f"{score} / {total}"
-            fixtext = f"0 / 0"
-        
+        st.success(f"⭐ You scored **{result['score']}**")
+        if quiz.in_round_2:
+            st.success(f"🔧 You fixed **{result['fixes']}**")
+        misspellings = "".join(
+            "<br>           " + word + f" ({ANSWER_LABELS[mode]}: {answer.lower() if mode == 'text' else answer})"
+            for word, mode, answer in quiz.misspelt
+        )
         save_history({
             "date": datetime.now().strftime("%Y-%m-%d %H:%M"),
-            "list": list_choice,
-            "score": scoretext,
-            "fixes": fixtext,
+            "list": st.session_state.quiz_list,
+            "score": result["score"],
+            "fixes": result["fixes"],
             "misspellings": misspellings
         })
+        st.session_state.saved = True
         st.balloons()
-        st.session_state.words = []
 else:
-    current_word_details = st.session_state.words[st.session_state.index]
-    current_word = current_word_details["word"]
-    qnum = st.session_state.index + 1
-    total = len(st.session_state.words)
-    # Pick mode once per word
-    if st.session_state.current_mode is None:
-        if "spell" in current_word_details:
-            st.session_state.current_mode = random.choice(["text", "mc"])
-        else:
-            st.session_state.current_mode = random.choice(["text"])
-        st.session_state.submitted = False
-        st.session_state.audio_file = None
-
-    dic = pyphen.Pyphen(lang="en")
-    syllables = dic.inserted(current_word).split("-")
-    if "syll" in current_word_details: 
-        syllables = current_word_details["syll"]
-    mp3_file = get_audio_for_word(current_word, syllables)
-    # ------------------ TEXT INPUT MODE ------------------
-    if st.session_state.current_mode == "text":
-        
-        
-        
-        
-        if st.session_state.in_round_2:
-            st.markdown(f"#### 🔊 Let's correct the misspelled words! ####")
-            st.error(f"Fix {qnum} of {total}")
-        else:
-            st.markdown(f"### 🔊 Listen and spell:")
-            st.info(f"Question {qnum} of {total}")
-        
-        
-        
-        if "user_word_value" not in st.session_state:
-            st.session_state.user_word_value = ""
-        if "submitted" not in st.session_state:
-            st.session_state.submitted = False
-            
-        # Form for text input
-        if not st.session_state.submitted:
-            st.audio(mp3_file)
+    current_word_details = quiz.current
+    current_word = current_word_details.word
+    qnum = quiz.question_number
+    total = quiz.total
+    mp3_file = question_audio(current_word_details)
+
+    if quiz.state == quiz.ASKING:
+        # ------------------ TEXT INPUT MODE ------------------
+        if quiz.mode == "text":
+            if quiz.in_round_2:
+                st.markdown(f"#### 🔊 Let's correct the misspelled words! ####")
+                st.error(f"Fix {qnum} of {total}")
+            else:
+                st.markdown(f"### 🔊 Listen and spell:")
+                st.info(f"Question {qnum} of {total}")
+            play_audio(mp3_file)
             with st.form(key="text_form"):
                 user_word = st.text_input(
                     "🪄",
-                    value="", #st.session_state.user_word_value,  
-                    key=current_word,
+                    value="",
+                    key=f"text_{quiz.round}_{quiz.index}",
                     placeholder="Type here",
+                    max_chars=MAX_ANSWER_CHARS,
                     autocomplete="off"
                 )
-                submitted = st.form_submit_button("Submit", disabled=st.session_state.submitted)
-                
+                submitted = st.form_submit_button("Submit")
             if submitted and len(user_word) > 0:
-                st.session_state.submitted = True
-                st.session_state.user_word_value = user_word     # store answer
+                submit_answer(user_word)
 
-                if user_word.upper() == current_word.upper():
-                    st.session_state.score += 1
-                    st.session_state.correct = True
-                    
-                else:
-                    if not st.session_state.in_round_2:
-                        st.session_state.misspelt += "<br>           " + current_word + " (typed: " + user_word.lower() + ")"
-                    st.session_state.redo_words.append(current_word_details)
-                    st.session_state.correct = False
-                    #
-                st.rerun()
-        else:
-            
-            if st.session_state.correct:
-                st.success(f"Correct. It was **{current_word}**.", icon="🪄")
+        # ------------------ MULTIPLE CHOICE MODE ------------------
+        elif quiz.mode == "mc":
+            if quiz.in_round_2:
+                st.markdown(f"#### ❓ Let's correct the misspelled words! ####")
+                st.error(f"Fix {qnum} of {total}")
             else:
-                st.error(f"Not quite. It was **{current_word}**.", icon="❌")
-                    
-            st.info("Current score: " + str(st.session_state.score) + " out of " + str(st.session_state.index + 1))
-                    
-            # st.session_state.submitted = True
-            if st.button("Next Word"):
-
-                st.session_state.index += 1
-                st.session_state.current_mode = None
-                st.session_state.submitted = False
-                st.session_state.user_word_value = ""
-             
-                if st.session_state.index >= len(st.session_state.words):
-                    # ---------- ROUND 1 FINISHED ----------
-                    if not st.session_state.in_round_2:
-                        
-                        if len(st.session_state.redo_words) > 0:
-                            st.session_state.scoretwo = st.session_state.score
-                            
-                            # Start Round 2
-                            st.session_state.words = st.session_state.redo_words[:]
-                            st.session_state.redo_words = []
-                            st.session_state.in_round_2 = True
-                
-                            # Option A — keep Round 1 score
-                            # (do nothing to score)
-                
-                            # Option B — reset score for Round 2
-                            st.session_state.score = 0
-                
-                            st.session_state.index = 0
-                            st.session_state.current_mode = None
-                            st.session_state.submitted = False
-                
-                            st.success("✨ Round 2: Let's correct the misspelled words!")
-                            st.rerun()
-                
-                        else:
-                            st.session_state.done = True
-                
-                    # ---------- ROUND 2 FINISHED ----------
-                    else:
-                        st.session_state.done = True
-        
-                st.rerun()
-        
-
-    # ------------------ MULTIPLE CHOICE MODE ------------------
-    elif st.session_state.current_mode == "mc":
-        if st.session_state.in_round_2:
-            st.markdown(f"#### ❓ Let's correct the misspelled words! ####")
-            st.error(f"Fix {qnum} of {total}")
-        else:
-            st.markdown(f"### ❓ Choose the spelling:")
-            st.info(f"Question {qnum} of {total}")
-        correct = current_word
-        options = [correct] + current_word_details.get("spell", [])
-    
-        # Shuffle options once per word
-        if st.session_state.mc_options is None:
-            random.shuffle(options)
-            st.session_state.mc_options = options
-            st.session_state.mc_selection = None
-    
-        # Use radio buttons inside a form
-        if not st.session_state.submitted:
-            st.audio(mp3_file)
+                st.markdown(f"### ❓ Choose the spelling:")
+                st.info(f"Question {qnum} of {total}")
+            play_audio(mp3_file)
             with st.form(key="mc_form"):
-                st.session_state.mc_selection = st.radio(
-                    "", st.session_state.mc_options, index=0
+                selected = st.radio(
+                    "Spelling", quiz.options, index=0, label_visibility="collapsed"
                 )
-                submitted = st.form_submit_button("Submit", disabled=st.session_state.submitted)
+                submitted = st.form_submit_button("Submit")
             if submitted:
-                st.session_state.submitted = True
-                selected = st.session_state.mc_selection
-                if selected.upper() == current_word.upper():
-                    st.session_state.score += 1
-                    st.session_state.correct = True
-                else:
-                    st.session_state.correct = False
-                    if not st.session_state.in_round_2:
-                        st.session_state.misspelt += "<br>           " + current_word + f" (selected: {selected})"
-                    st.session_state.redo_words.append(current_word_details)
-                st.rerun()
+                submit_answer(selected)
 
+        # ------------------ MISSING LETTER MODE ------------------
         else:
-            if st.session_state.correct:
-                st.success(f"Correct. It was **{current_word}**.", icon="🪄")
+            if quiz.in_round_2:
+                st.markdown(f"#### ❓ Let's correct the misspelled words! ####")
+                st.error(f"Fix {qnum} of {total}")
             else:
-                st.error(f"Not quite. It was **{current_word}**.", icon="❌")
-                    
-            st.info("Current score: " + str(st.session_state.score) + " out of " + str(st.session_state.index + 1))
-
-            if st.button("Next Word"):
-
-                st.session_state.index += 1
-                st.session_state.current_mode = None
-                st.session_state.submitted = False
-                st.session_state.mc_options = None
-                st.session_state.mc_selection = None
-             
-                if st.session_state.index >= len(st.session_state.words):
-                    # ---------- ROUND 1 FINISHED ----------
-                    if not st.session_state.in_round_2:
-                        st.session_state.scoretwo = st.session_state.score
-                        if len(st.session_state.redo_words) > 0:
-                            # Start Round 2
-                            st.session_state.words = st.session_state.redo_words[:]
-                            st.session_state.redo_words = []
-                            st.session_state.in_round_2 = True
-                
-                            # Option A — keep Round 1 score
-                            # (do nothing to score)
-                
-                            # Option B — reset score for Round 2
-                            st.session_state.score = 0
-                
-                            st.session_state.index = 0
-                            st.session_state.current_mode = None
-                            st.session_state.submitted = False
-                
-                            st.success("✨ Round 2: Let's correct the misspelled words!")
-                            st.rerun()
-                
-                        else:
-                            st.session_state.done = True
-                
-                    # ---------- ROUND 2 FINISHED ----------
-                    else:
-                        st.session_state.done = True
-        
-                st.rerun()
-    # ------------------ MISSING LETTER MODE ------------------
-    else:
-        if st.session_state.in_round_2:
-            st.markdown(f"#### ❓ Let's correct the misspelled words! ####")
-            st.error(f"Fix {qnum} of {total}")
-        else:
-            st.markdown(f"### ❓ Fill the missing letters:")
-            st.info(f"Question {qnum} of {total}")
-        correct = current_word
-        options = [correct] + current_word_details.get("spell", [])
-        missing_indices = sorted(random.sample(range(len(current_word)), 3))
-        user_letters = {}
-        display_word = ""
-        
-        
-        
-        
-        letters=["A","B","C","D","E","F","G","H","I","J","K","L","M","N","O","P","Q","R","S","T","U","V","W","X","Y","Z"]
-        # Use radio buttons inside a form
-        if not st.session_state.submitted:
-            st.audio(mp3_file)
-            
-            with st.form(key="mc_form"):
-                for i, letter in enumerate(current_word):
-                    if i in missing_indices:
-                        
-                        if i==0:
-                            test = st.session_state.missing_1
-                        elif i==1:
-                            test = st.session_state.missing_2
-                        else:
-                            test = st.session_state.missing_3
-                        # Dropdown with persisted value
-                        user_letters[i] = st.selectbox(
-                            f"Letter {i+1}",
-                            options=letters,
-                            
-                            index=letters.index(test) if test in letters else 0,
-                            key=test
-                        )
-                        # Update session_state
-                        # st.session_state[flump] = user_letters[i]
-                
-                        display_word += "_"
-                    else:
-                        display_word += letter
-                st.success(f"Word to fill: {display_word}")
-                submitted = st.form_submit_button("Submit", disabled=st.session_state.submitted)
-            if submitted:
-                st.session_state.submitted = True
-                correct = True
-                if st.session_state.missing_1 == 1:
-                    st.info ("ggg")
-                for i in missing_indices:
-                    if st.session_state[f"letter_{i}"].upper() != word[i]:
-                        correct = False
-                        break
-                
-                if correct:
-                    st.session_state.score += 1
-                    st.session_state.correct = True
+                st.markdown(f"### ❓ Fill the missing letters:")
+                st.info(f"Question {qnum} of {total}")
+            play_audio(mp3_file)
+            # The blanks were chosen when the question was asked; all of them
+            # are typed into one box, in order, and checked together
+            st.success(f"Word to fill: {' '.join(quiz.pattern)}")
+            with st.form(key="missing_form"):
+                letters = st.text_input(
+                    f"Type the {len(quiz.blanks)} missing letter(s) in order",
+                    value="",
+                    key=f"missing_{quiz.round}_{quiz.index}",
+                    max_chars=len(quiz.blanks) * 2,
+                    autocomplete="off"
+                )
+                submitted = st.form_submit_button("Submit")
+            if submitted and letters.strip():
+                try:
+                    filled = quiz.fill(letters)
+                except QuizError:
+                    st.warning(f"Type exactly {len(quiz.blanks)} letter(s).")
                 else:
-                    st.session_state.correct = False
-                    if not st.session_state.in_round_2:
-                        st.session_state.misspelt += "<br>           " + current_word + f" (todo)"
-                    st.session_state.redo_words.append(current_word_details)
-                #st.rerun()
+                    submit_answer(filled)
 
+    # ------------------ FEEDBACK ------------------
+    else:
+        if quiz.correct:
+            st.success(f"Correct. It was **{current_word}**.", icon="🪄")
         else:
-            if st.session_state.correct:
-                st.success(f"Correct. It was **{current_word}**.", icon="🪄")
-            else:
-                st.error(f"Not quite. It was **{current_word}**.", icon="❌")
-                    
-            st.info("Current score: " + str(st.session_state.score) + " out of " + str(st.session_state.index + 1))
-
-            if st.button("Next Word"):
-
-                st.session_state.index += 1
-                st.session_state.current_mode = None
-                st.session_state.submitted = False
-             
-                if st.session_state.index >= len(st.session_state.words):
-                    # ---------- ROUND 1 FINISHED ----------
-                    if not st.session_state.in_round_2:
-                        st.session_state.scoretwo = st.session_state.score
-                        if len(st.session_state.redo_words) > 0:
-                            # Start Round 2
-                            st.session_state.words = st.session_state.redo_words[:]
-                            st.session_state.redo_words = []
-                            st.session_state.in_round_2 = True
-                
-                            # Option A — keep Round 1 score
-                            # (do nothing to score)
-                
-                            # Option B — reset score for Round 2
-                            st.session_state.score = 0
-                
-                            st.session_state.index = 0
-                            st.session_state.current_mode = None
-                            st.session_state.submitted = False
-                
-                            st.success("✨ Round 2: Let's correct the misspelled words!")
-                            st.rerun()
-                
-                        else:
-                            st.session_state.done = True
-                
-                    # ---------- ROUND 2 FINISHED ----------
-                    else:
-                        st.session_state.done = True
-        
-                st.rerun()
-            
-
-
-
-
-
-
-                
-               
-
-
-
-
-
-
-
+            st.error(f"Not quite. It was **{current_word}**.", icon="❌")
+            mistakes = grade(current_word, quiz.last_attempt["answer"]).errors
+            if mistakes:
+                st.caption(f"You {describe(mistakes)}.")
 
+        st.info("Current score: " + str(quiz.score) + " out of " + str(quiz.question_number))
 
+        if st.button("Next Word"):
+            quiz.next()
+            rerun()
 
+    preload_audio(quiz.upcoming(PREFETCH))
 
 # ------------------ HISTORY PANEL ----------------------
 st.markdown("---")
 st.subheader("📊 Past Results")
-if len(history) == 0:
+HISTORY_PAGE_SIZE = 10
+col1, col2 = st.columns(2)
+history_list = col1.selectbox("List", ["All lists"] + list(WORD_LISTS.keys()), key="history_list")
+history_dates = col2.date_input("Dates", value=(), key="history_dates")
+history_filter = (
+    None if history_list == "All lists" else history_list,
+    history_dates[0] if len(history_dates) > 0 else None,
+    history_dates[-1] if len(history_dates) > 1 else None,
+)
+# Pages are fetched one at a time with a cursor and kept in session state,
+# so each rerun only queries what hasn't been loaded yet.
+if st.session_state.get("history_filter") != history_filter or "history_rows" not in st.session_state:
+    rows, cursor = history.query(*history_filter, limit=HISTORY_PAGE_SIZE)
+    st.session_state.history_filter = history_filter
+    st.session_state.history_rows = rows
+    st.session_state.history_cursor = cursor
+recent = st.session_state.history_rows
+if len(recent) == 0:
     st.info("No history yet. Complete a test to see stats!")
 else:
-    for entry in reversed(history[-10:]):
+    for entry in recent:
         st.markdown(f"""
             🗓 **{entry['date']}**  
             📚 List: *{entry['list']}*  
@@ -508,6 +342,60 @@ else:
             🔤 Misspellings: {entry['misspellings']} 
             <br><br>
         """, unsafe_allow_html=True)
+    if st.session_state.history_cursor is not None and st.button("Load more"):
+        rows, cursor = history.query(
+            *history_filter, before=st.session_state.history_cursor, limit=HISTORY_PAGE_SIZE
+        )
+        st.session_state.history_rows = recent + rows
+        st.session_state.history_cursor = cursor
+        rerun()
+
+# ------------------ WORD MASTERY ----------------------
+with st.expander("🎯 Word mastery"):
+    word_stats = history.word_stats(list_choice)
+    if len(word_stats) == 0:
+        st.info("No answers recorded for this list yet.")
+    else:
+        st.markdown("**Trickiest words first**")
+        st.dataframe(
+            [{"Word": w["word"], "Tries": w["attempts"], "Correct": w["correct"], "Accuracy": f"{w['accuracy']:.0%}"} for w in word_stats],
+            hide_index=True,
+        )
+        mistakes = history.error_stats(list_choice)
+        if mistakes:
+            st.markdown("**Common mistakes**")
+            st.dataframe(
+                [{"Mistake": ERRORS[m["error"]].capitalize(), "Times": m["count"], "Words": ", ".join(m["words"])}
+                 for m in mistakes],
+                hide_index=True,
+            )
+        daily = history.daily_stats(list_choice)
+        if len(daily) > 1:
+            st.markdown("**Accuracy over time**")
+            st.line_chart({"Accuracy": {d["day"]: d["accuracy"] for d in daily}})
+
+# ------------------ DEBUG PANEL ----------------------
+# Shown with ?debug=1 or SPELLTEST_DEBUG=1. "audio" includes "tts".
+rerun_total, rerun_stages = metrics.end_rerun()
+if os.environ.get("SPELLTEST_DEBUG") or st.query_params.get("debug") == "1":
+    with st.sidebar.expander("🐞 Debug timings", expanded=True):
+        st.markdown(f"**This rerun:** {rerun_total * 1000:.1f} ms")
+        st.markdown(f"**Session seed:** `{quiz.seed}` (replay with `?seed={quiz.seed}`)")
+        st.dataframe(
+            [{"Stage": stage, "ms": round(seconds * 1000, 2)} for stage, seconds in sorted(rerun_stages.items())],
+            hide_index=True,
+        )
+        timers, counters = metrics.snapshot()
+        st.markdown("**Since server start**")
+        st.dataframe(
+            [{"Stage": stage, "Calls": t["calls"], "Avg ms": round(t["total_s"] / t["calls"] * 1000, 2),
+              "Max ms": round(t["max_s"] * 1000, 2)} for stage, t in sorted(timers.items())],
+            hide_index=True,
+        )
+        for cache in ["word_lists", "word_clip", "fragment"]:
+            rate = metrics.hit_rate(cache)
+            if rate is not None:
+                st.markdown(f"Cache `{cache}`: {rate:.0%} hits")
 
 
 
@@ -0,0 +1,236 @@
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import yaml
+from wordlists import (
+    LISTS_DIR, WORDS_FILE, WordListError, entry_record, list_path, load_word_lists, parse_entry,
+)
+
+# ------------------ BULK IMPORT / EXPORT ------------------
+# Imports large word lists into LISTS_DIR, one precomputed file per list, so
+# the app never re-parses or re-hyphenates them. The source is read as a
+# stream, one entry at a time. Usage:
+#
+#   python wordimport.py import year5.csv --name "Year 5"
+#   python wordimport.py import more.yaml          # every list in the file
+#   python wordimport.py export "Year 5" --format csv -o year5.csv
+#
+# CSV: a `word` column and optional `spell` and `syll` columns, several
+# values separated by "|"; without a header row the columns are taken in
+# that order. Text: one word per line, "#" starts a comment. YAML: the
+# words.yaml layout, or a bare list of entries.
+FORMATS = ("csv", "yaml", "txt")
+MULTI_SEP = "|"
+
+def guess_format(path):
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    return {"yml": "yaml", "text": "txt"}.get(ext, ext if ext in FORMATS else "txt")
+
+# ------------------ READERS ------------------
+# Each yields (list name, raw entry, where); raw entries are what
+# parse_entry() accepts, so every format is validated the same way.
+def _split(cell):
+    values = [v.strip() for v in (cell or "").split(MULTI_SEP) if v.strip()]
+    return values or None
+
+def read_csv(f, name):
+    rows = csv.reader(f)
+    columns = ["word", "spell", "syll"]
+    for number, row in enumerate(rows, 1):
+        if not row or not "".join(row).strip():
+            continue
+        if number == 1 and row[0].strip().lower() == "word":
+            columns = [c.strip().lower() for c in row]
+            continue
+        raw = {}
+        for column, cell in zip(columns, row):
+            if column == "word":
+                raw["word"] = cell
+            elif _split(cell):
+                raw[column] = _split(cell)
+        yield name, raw, f"line {number}"
+
+def read_txt(f, name):
+    for number, line in enumerate(f, 1):
+        word = line.split("#", 1)[0].strip()
+        if word:
+            yield name, word, f"line {number}"
+
+def _build(event, events):
+    # Turns the YAML events of one node back into plain values
+    if isinstance(event, yaml.ScalarEvent):
+        if event.style is None and event.value in ("", "~", "null"):
+            return None
+        return event.value
+    if isinstance(event, yaml.SequenceStartEvent):
+        items = []
+        for e in events:
+            if isinstance(e, yaml.SequenceEndEvent):
+                return items
+            items.append(_build(e, events))
+    if isinstance(event, yaml.MappingStartEvent):
+        mapping = {}
+        for e in events:
+            if isinstance(e, yaml.MappingEndEvent):
+                return mapping
+            mapping[_build(e, events)] = _build(next(events), events)
+    raise WordListError(f"line {event.start_mark.line + 1}: unsupported YAML ({type(event).__name__})")
+
+def _yaml_list(events, name):
+    start = next(events)
+    if not isinstance(start, yaml.SequenceStartEvent):
+        raise WordListError(f"line {start.start_mark.line + 1}: list '{name}' must be a list of words")
+    for number, event in enumerate(events, 1):
+        if isinstance(event, yaml.SequenceEndEvent):
+            return
+        yield name, _build(event, events), f"list '{name}', entry {number}"
+
+def read_yaml(f, name):
+    # Walks the parser's events instead of loading the document, so only
+    # one entry is in memory at a time
+    events = iter(yaml.parse(f))
+    for event in events:
+        if isinstance(event, yaml.MappingStartEvent):
+            for key in events:
+                if isinstance(key, yaml.MappingEndEvent):
+                    break
+                yield from _yaml_list(events, _build(key, events))
+        elif isinstance(event, yaml.SequenceStartEvent):
+            if not name:
+                raise WordListError("a bare YAML list needs --name")
+            yield from _yaml_list(_prepend(event, events), name)
+
+def _prepend(first, events):
+    yield first
+    yield from events
+
+READERS = {"csv": read_csv, "yaml": read_yaml, "txt": read_txt}
+
+# ------------------ IMPORT ------------------
+class ListWriter:
+    # Writes one list to a temporary file next to its destination, replacing
+    # the old file only once every entry has been written.
+    def __init__(self, name, lists_dir):
+        self.name = name
+        self.path = list_path(name, lists_dir)
+        self.seen = set()
+        self.count = 0
+        self.duplicates = 0
+        fd, self.tmp = tempfile.mkstemp(dir=lists_dir, suffix=".tmp")
+        self.file = os.fdopen(fd, "w", encoding="utf-8", newline="\n")
+
+    def add(self, entry):
+        key = entry.word.lower()
+        if key in self.seen:
+            self.duplicates += 1
+            return
+        self.seen.add(key)
+        self.file.write(entry_record(entry) + "\n")
+        self.count += 1
+
+    def commit(self):
+        self.file.close()
+        os.replace(self.tmp, self.path)
+
+    def abort(self):
+        self.file.close()
+        os.remove(self.tmp)
+
+def import_lists(f, fmt, name=None, lists_dir=LISTS_DIR, errors=None):
+    # Invalid entries are skipped and reported through `errors`; returns the
+    # writers of the lists that were imported
+    os.makedirs(lists_dir, exist_ok=True)
+    if fmt != "yaml" and not name:
+        raise WordListError(f"importing {fmt} needs --name")
+    writers = {}
+    try:
+        for list_name, raw, where in READERS[fmt](f, name):
+            list_name = str(list_name).strip()
+            if not list_name:
+                raise WordListError(f"{where}: empty list name")
+            writer = writers.get(list_name)
+            if writer is None:
+                writer = writers[list_name] = ListWriter(list_name, lists_dir)
+            try:
+                writer.add(parse_entry(raw, f"list '{list_name}', {where}" if fmt != "yaml" else where))
+            except WordListError as e:
+                if errors is None:
+                    raise
+                errors.append(str(e))
+    except BaseException:
+        for writer in writers.values():
+            writer.abort()
+        raise
+    for writer in writers.values():
+        writer.commit()
+    return list(writers.values())
+
+# ------------------ EXPORT ------------------
+def export_list(entries, out, fmt, name):
+    if fmt == "csv":
+        writer = csv.writer(out, lineterminator="\n")
+        writer.writerow(["word", "spell", "syll"])
+        for entry in entries:
+            writer.writerow([entry.word, MULTI_SEP.join(entry.spell), MULTI_SEP.join(entry.syll or ())])
+    elif fmt == "txt":
+        for entry in entries:
+            out.write(entry.word + "\n")
+    else:
+        header = yaml.safe_dump({name: []}, allow_unicode=True)
+        out.write(header[:header.rindex(" []")] + "\n")
+        for entry in entries:
+            out.write(f"  - word: {_flow(entry.word)}\n")
+            if entry.spell:
+                out.write(f"    spell: {_flow(list(entry.spell))}\n")
+            if entry.syll:
+                out.write(f"    syll: {_flow(list(entry.syll))}\n")
+
+def _flow(value):
+    # One YAML value on one line, quoted only where YAML needs it
+    text = yaml.safe_dump([value], default_flow_style=True, allow_unicode=True, width=float("inf")).strip()
+    return text[1:-1]
+
+# ------------------ CLI ------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import and export word lists")
+    commands = parser.add_subparsers(dest="command", required=True)
+    imp = commands.add_parser("import", help="import a CSV, YAML or text file into the word store")
+    imp.add_argument("file")
+    imp.add_argument("--name", help="list name (required for CSV and text files)")
+    imp.add_argument("--format", choices=FORMATS, help="default: from the file extension")
+    imp.add_argument("--lists-dir", default=LISTS_DIR)
+    exp = commands.add_parser("export", help="write a list out")
+    exp.add_argument("name")
+    exp.add_argument("--format", choices=FORMATS, default="yaml")
+    exp.add_argument("-o", "--output", help="default: standard output")
+    exp.add_argument("--words", default=WORDS_FILE)
+    exp.add_argument("--lists-dir", default=LISTS_DIR)
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "import":
+            errors = []
+            with open(args.file, "r", encoding="utf-8-sig", newline="") as f:
+                writers = import_lists(f, args.format or guess_format(args.file), args.name, args.lists_dir, errors)
+            for error in errors:
+                print(f"skipped {error}", file=sys.stderr)
+            for w in writers:
+                print(f"{w.name}: {w.count} words imported, {w.duplicates} duplicates dropped -> {w.path}")
+            return 1 if errors else 0
+        lists = load_word_lists(args.words, args.lists_dir)
+        if args.name not in lists:
+            raise WordListError(f"no list named {args.name!r}")
+        if args.output:
+            with open(args.output, "w", encoding="utf-8", newline="") as out:
+                export_list(lists[args.name], out, args.format, args.name)
+        else:
+            export_list(lists[args.name], sys.stdout, args.format, args.name)
+        return 0
+    except (OSError, WordListError, yaml.YAMLError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+if __name__ == "__main__":
+    sys.exit(main())
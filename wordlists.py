@@ -0,0 +1,237 @@
+import functools
+import hashlib
+import importlib.util
+import json
+import os
+import threading
+from collections import namedtuple
+from urllib.parse import quote, unquote
+import distractors
+import metrics
+
+WORDS_FILE = "words.yaml"
+# Imported lists, one precomputed file per list (see wordimport.py)
+LISTS_DIR = "lists"
+LIST_SUFFIX = ".jsonl"
+# words.yaml compiled with its syllables and distractors, reused by the next
+# process to start while words.yaml is unchanged
+COMPILED_SUFFIX = ".compiled.jsonl"
+# Bump when the compiled layout or how entries are built changes
+COMPILER_VERSION = 1
+
+# One entry of a word list. `spell` holds the wrong spellings offered in
+# multiple choice mode, `syll` an optional override of the syllables read out
+# and `syllables` what is actually read out (the override, else pyphen's split).
+# `distractors` are the wrong options for multiple choice: `spell` if given,
+# else misspellings generated when the list is loaded.
+WordEntry = namedtuple("WordEntry", ["word", "spell", "syll", "syllables", "distractors"])
+YAML_KEYS = {"word", "spell", "syll"}
+
+class WordListError(ValueError):
+    pass
+
+class WordLists(dict):
+    # Maps list name -> tuple of WordEntry; `digest` identifies the contents
+    # of all the files, `digests` the file each list came from
+    def __init__(self, lists, digest, digests=None):
+        super().__init__(lists)
+        self.digest = digest
+        self.digests = digests or {name: digest for name in lists}
+
+# ------------------ SYLLABLES ------------------
+# Loading the hyphenation dictionary is the expensive part, so there is one
+# per language per process, loaded only when a word needs splitting.
+@functools.lru_cache(maxsize=None)
+def hyphenator(lang="en"):
+    import pyphen
+    return pyphen.Pyphen(lang=lang)
+
+@metrics.timer("hyphenate")
+def split_syllables(word, lang="en"):
+    return tuple(hyphenator(lang).inserted(word).split("-"))
+
+# ------------------ VALIDATION ------------------
+def _string_list(value, field, where):
+    if value is None:
+        return None
+    if not isinstance(value, list) or not all(isinstance(v, str) and v.strip() for v in value):
+        raise WordListError(f"{where}: '{field}' must be a list of words")
+    return tuple(v.strip() for v in value)
+
+def parse_entry(raw, where):
+    if isinstance(raw, str):
+        raw = {"word": raw}
+    if not isinstance(raw, dict):
+        raise WordListError(f"{where}: expected a mapping with a 'word' key")
+    unknown = set(raw) - YAML_KEYS
+    if unknown:
+        raise WordListError(f"{where}: unknown key(s) {', '.join(sorted(unknown))}")
+    word = raw.get("word")
+    if not isinstance(word, str) or not word.strip():
+        raise WordListError(f"{where}: 'word' is missing or empty")
+    word = word.strip()
+    syll = _string_list(raw.get("syll"), "syll", where)
+    spell = _string_list(raw.get("spell"), "spell", where) or ()
+    return WordEntry(
+        word=word,
+        spell=spell,
+        syll=syll,
+        syllables=syll or split_syllables(word),
+        distractors=spell or distractors.generate(word),
+    )
+
+def parse_word_lists(data):
+    if not isinstance(data, dict):
+        raise WordListError("the file must map list names to lists of words")
+    lists = {}
+    for name, entries in data.items():
+        if not isinstance(entries, list):
+            raise WordListError(f"list '{name}': expected a list of words")
+        lists[str(name)] = tuple(
+            parse_entry(raw, f"list '{name}', entry {i + 1}") for i, raw in enumerate(entries)
+        )
+    return lists
+
+# ------------------ LIST FILES ------------------
+# An imported list is stored as one JSON object per line with the syllables
+# and distractors already worked out, so loading it needs neither pyphen nor
+# the distractor rules.
+def list_path(name, lists_dir=LISTS_DIR):
+    return os.path.join(lists_dir, quote(name, safe="") + LIST_SUFFIX)
+
+def list_files(lists_dir=LISTS_DIR):
+    if not os.path.isdir(lists_dir):
+        return []
+    return sorted(os.path.join(lists_dir, f) for f in os.listdir(lists_dir) if f.endswith(LIST_SUFFIX))
+
+def entry_record(entry):
+    return json.dumps(entry._asdict(), ensure_ascii=False)
+
+def parse_record(line):
+    return record_entry(json.loads(line))
+
+def record_entry(raw):
+    return WordEntry(
+        word=raw["word"],
+        spell=tuple(raw["spell"]),
+        syll=tuple(raw["syll"]) if raw["syll"] is not None else None,
+        syllables=tuple(raw["syllables"]),
+        distractors=tuple(raw["distractors"]),
+    )
+
+def parse_list_file(raw, path, digest=None):
+    name = unquote(os.path.basename(path)[:-len(LIST_SUFFIX)])
+    try:
+        return {name: tuple(parse_record(line) for line in raw.decode("utf-8").splitlines() if line.strip())}
+    except (ValueError, KeyError, TypeError) as e:
+        raise WordListError(f"{path}: {e}") from None
+
+# ------------------ CACHED LOADER ------------------
+# Streamlit re-executes the script on every click, so the parsed lists are
+# kept per process. A rerun costs a stat() per file; a file is re-read only
+# when its mtime or size changes, and re-parsed only when its contents did,
+# so importing a new list doesn't re-parse the others. Lists in LISTS_DIR
+# replace a list of the same name in words.yaml.
+_cache = {}
+_merged = {}
+_cache_lock = threading.Lock()
+
+# ------------------ COMPILED WORDS.YAML ------------------
+# A cold start would otherwise parse the YAML, load pyphen's dictionary and
+# run the distractor rules before the first paint. The result is saved next
+# to the file under its digest and the inputs it was built with: the
+# distractor rules, the real-word dictionary and pyphen. Changing any of
+# them recompiles.
+def compiled_path(path):
+    return path + COMPILED_SUFFIX
+
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+def compiler_stamp():
+    with open(distractors.__file__, "rb") as f:
+        rules = hashlib.sha1(f.read()).hexdigest()
+    # Only located, not imported: importing pyphen is what the cache avoids
+    spec = importlib.util.find_spec("pyphen")
+    return {
+        "version": COMPILER_VERSION,
+        "rules": rules,
+        "dict": [distractors.DICT_FILE, _file_stamp(distractors.DICT_FILE)],
+        "pyphen": _file_stamp(spec.origin if spec else None),
+    }
+
+def _read_compiled(path, digest, stamp):
+    try:
+        with open(compiled_path(path), "r", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header.get("digest") != digest or header.get("compiler") != stamp:
+                return None
+            lists = {}
+            for line in f:
+                raw = json.loads(line)
+                lists[raw["name"]] = tuple(record_entry(e) for e in raw["entries"])
+            return lists
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def _write_compiled(path, digest, stamp, lists):
+    target = compiled_path(path)
+    tmp = f"{target}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+            f.write(json.dumps({"digest": digest, "compiler": stamp}) + "\n")
+            for name, entries in lists.items():
+                f.write(json.dumps({"name": name, "entries": [e._asdict() for e in entries]}, ensure_ascii=False) + "\n")
+        os.replace(tmp, target)
+    except OSError:
+        # A read-only checkout just compiles on every start
+        pass
+
+def _parse_yaml(raw, path, digest):
+    stamp = compiler_stamp()
+    lists = _read_compiled(path, digest, stamp)
+    metrics.cache_hit("compiled_words", lists is not None)
+    if lists is None:
+        import yaml
+        loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+        lists = parse_word_lists(yaml.load(raw, Loader=loader))
+        _write_compiled(path, digest, stamp, lists)
+    return lists
+
+def _load_file(path, parse):
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cached = _cache.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    with open(path, "rb") as f:
+        raw = f.read()
+    digest = hashlib.sha1(raw).hexdigest()
+    if cached is not None and cached[1][0] == digest:
+        loaded = cached[1]
+    else:
+        loaded = (digest, parse(raw, path, digest))
+    _cache[path] = (stamp, loaded)
+    return loaded
+
+@metrics.timer("word_load")
+def load_word_lists(path=WORDS_FILE, lists_dir=LISTS_DIR):
+    sources = [(path, _parse_yaml)] + [(p, parse_list_file) for p in list_files(lists_dir)]
+    with _cache_lock:
+        loaded = [_load_file(p, parse) for p, parse in sources]
+        file_digests = tuple(digest for digest, _ in loaded)
+        cached = _merged.get((path, lists_dir))
+        metrics.cache_hit("word_lists", cached is not None and cached[0] == file_digests)
+        if cached is not None and cached[0] == file_digests:
+            return cached[1]
+        merged, digests = {}, {}
+        for digest, file_lists in loaded:
+            merged.update(file_lists)
+            digests.update(dict.fromkeys(file_lists, digest))
+        lists = WordLists(merged, hashlib.sha1("".join(file_digests).encode()).hexdigest(), digests)
+        _merged[(path, lists_dir)] = (file_digests, lists)
+        return lists